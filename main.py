@@ -3,25 +3,43 @@ import numpy as np
 from datetime import datetime, timedelta
 import uvicorn
 from fastapi import FastAPI, Request, HTTPException, Cookie
-from fastapi.responses import HTMLResponse, FileResponse, RedirectResponse, JSONResponse, StreamingResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, FileResponse, RedirectResponse, JSONResponse, ORJSONResponse, Response
+import orjson
 import os
 import socket
 from typing import Optional
 import sys
+import importlib.util
 from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import hashlib
 import secrets
 import string
 from PIL import Image, ImageDraw, ImageFont
 import io
+import gzip
 import base64
 import re
+import html
+import math
+from decimal import Decimal, ROUND_HALF_UP
+from email.utils import formatdate
 from pathlib import Path
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+from openpyxl.styles import Font, PatternFill, Border, Side, Alignment, NamedStyle
+from openpyxl.styles.fonts import DEFAULT_FONT
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.utils import get_column_letter
 
+# The Rust calamine reader parses the source workbooks several times faster
+# than openpyxl; fall back to openpyxl where it is not installed.
+# pandas imports the module itself, so only its presence is checked here
+EXCEL_READ_ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') else 'openpyxl'
+
 # ==================== WARRANTY DATA PROCESSING ====================
 
 WARRANTY_DATA = {
@@ -34,9 +52,40 @@ WARRANTY_DATA = {
     'compensation_df': None,
     'compensation_source_df': None,
     'pr_approval_df': None,
-    'pr_approval_source_df': None
+    'pr_approval_source_df': None,
+    # Warranty source row positions per Dealer Location, built together with source_df
+    'source_rows_by_location': {},
+    # Bumped on every load and part of every response cache key
+    'generation': 0
 }
 
+# Serializes reloads so two loads never publish out of order
+DATA_RELOAD_LOCK = threading.Lock()
+
+def data_snapshot():
+    """Return a consistent copy of WARRANTY_DATA for building one response"""
+    # Loads publish every key with a single dict update, so a copy never mixes two loads
+    return dict(WARRANTY_DATA)
+
+# Fiscal year month order used to sort warranty source rows
+FISCAL_MONTHS = ['Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec', 'Jan', 'Feb', 'Mar']
+
+# Warranty Debit columns used by the dashboard tables and the Credit/Debit/Arbitration exports
+WARRANTY_SOURCE_COLUMNS = [
+    'Fiscal Month', 'Dealer Location', 'Claim arbitration ID', 'Claim Invoice Date',
+    'Claim No', 'Claim Date', 'Chassis No', 'Ro Id', 'Claim Type',
+    'Total Claim Amount', 'Credit Note Amount', 'Debit Note Amount'
+]
+
+@lru_cache(maxsize=None)
+def list_data_directory(directory):
+    """Return the entry names of a directory with a single scandir pass"""
+    try:
+        with os.scandir(directory) as entries:
+            return frozenset(entry.name for entry in entries)
+    except OSError:
+        return frozenset()
+
 def find_data_file(filename):
     """Find data file in multiple possible locations"""
     possible_paths = [
@@ -47,14 +96,78 @@ def find_data_file(filename):
         f"data/{filename}",
     ]
     
+    # Each candidate directory is listed once and shared by every lookup,
+    # instead of one stat call per candidate path per file
     for path in possible_paths:
-        if os.path.exists(path):
+        directory, name = os.path.split(path)
+        if name in list_data_directory(directory or '.'):
             print(f"  Found: {filename} at {path}")
             return path
     
     print(f"  WARNING: {filename} not found. Checked: {possible_paths}")
     return None
 
+def read_excel_file(path, **kwargs):
+    """Read an Excel file with the fastest available engine"""
+    # The path goes straight to the reader: calamine and openpyxl both open the zip
+    # themselves, and wrapping the bytes in BytesIO would only add a full copy of the file
+    kwargs.setdefault('engine', EXCEL_READ_ENGINE)
+    if kwargs['engine'] == 'openpyxl':
+        # Streamed read-only cells with cached formula values only
+        kwargs.setdefault('engine_kwargs', {'read_only': True, 'data_only': True})
+    return pd.read_excel(path, **kwargs)
+
+def shrink_dataframe(df):
+    """Down-cast integer columns and convert repetitive text columns to category"""
+    if df is None or df.empty:
+        return df
+    
+    dtypes = {}
+    
+    # Integers are down-cast losslessly; float columns hold currency amounts and
+    # stay float64 because float32 cannot represent paise exactly
+    for col in df.select_dtypes(include='integer').columns:
+        dtypes[col] = pd.to_numeric(df[col], downcast='integer').dtype
+    
+    # Low-cardinality text becomes category (int codes); columns with blanks stay
+    # object so per-value callbacks in the exports still see NaN
+    for col in df.select_dtypes(include='object').columns:
+        values = df[col]
+        if values.notna().all() and values.nunique() < 0.5 * len(df):
+            dtypes[col] = 'category'
+    
+    return df.astype(dtypes) if dtypes else df
+
+def append_grand_total(df, aggregations):
+    """Append a 'Grand Total' row reducing each column as given, keeping the column dtypes"""
+    # The whole row comes from one agg call; its upcast Series is cast back so counts stay integers
+    columns = list(aggregations)
+    totals = df.agg(aggregations).to_frame().T.astype(df.dtypes[columns].to_dict())
+    totals.insert(0, 'Division', 'Grand Total')
+    return pd.concat([df, totals], ignore_index=True)
+
+def format_claim_numbers(values):
+    """Format a column of claim numbers as text, dropping the '.0' Excel adds to numeric cells"""
+    # Vectorized str(int(float(x))), falling back to the stripped text for non-numeric values
+    numbers = pd.to_numeric(values, errors='coerce').astype(float)
+    is_number = np.isfinite(numbers)
+    text = values.astype(str).str.strip()
+    # Only values inside the int64 range take the vectorized cast; larger ones would wrap,
+    # so they keep their digits through Python int like the original per-row helper
+    fits_int64 = is_number & (numbers.abs() < 2**63)
+    text.loc[fits_int64] = numbers[fits_int64].astype('int64').astype(str)
+    too_large = is_number & ~fits_int64
+    if too_large.any():
+        text.loc[too_large] = numbers[too_large].map(lambda v: str(int(v)))
+    text.loc[values.isna()] = ''
+    return text
+
+def format_ro_ids(values):
+    """Format a column of RO ids as text with the "RO" prefix"""
+    text = format_claim_numbers(values)
+    needs_prefix = (text != '') & ~text.str.startswith('RO')
+    return text.where(~needs_prefix, 'RO' + text)
+
 def process_pr_approval():
     """Process PR Approval data and return summary dataframe"""
     #  FIXED: Correct file path pointing to Pr_Approval_Claims_Merged.xlsx
@@ -66,7 +179,7 @@ def process_pr_approval():
     
     try:
         # Load the data - read first sheet
-        df = pd.read_excel(input_path)
+        df = read_excel_file(input_path)
         print("  PR Approval data loaded successfully")
         print(f"  Available columns: {df.columns.tolist()[:10]}...")
         print(f"  Total rows in source data: {len(df)}")
@@ -97,6 +210,7 @@ def process_pr_approval():
             df_summary_display = df_summary_display[df_summary_display['Division'].notna() & 
                                                       (df_summary_display['Division'] != '') & 
                                                       (df_summary_display['Division'] != 'nan')]
+            df_summary_display['Division'] = df_summary_display['Division'].astype('category')
         
         # Clean numeric columns
         if 'App. Claim Amt from M&M' in df_summary_display.columns:
@@ -104,43 +218,30 @@ def process_pr_approval():
                 df_summary_display['App. Claim Amt from M&M'], errors='coerce'
             ).fillna(0)
         
-        # Prepare summary by division
-        summary_data = []
-        
+        # Prepare summary by division in one grouped pass
         if 'Division' in df_summary_display.columns:
-            for division in sorted(df_summary_display['Division'].unique()):
-                div_data = df_summary_display[df_summary_display['Division'] == division]
-                
-                summary_row = {'Division': division}
-                
-                # Count of requests
-                summary_row['Total Requests'] = len(div_data)
-                
-                # Sum of App. Claim Amt from M&M
-                if 'App. Claim Amt from M&M' in df_summary_display.columns:
-                    summary_row['Total Approved Amount'] = div_data['App. Claim Amt from M&M'].sum()
-                
-                # Count by Request Type if available
-                if 'Request Type' in df_summary_display.columns:
-                    request_types = div_data['Request Type'].value_counts().to_dict()
-                    for req_type, count in request_types.items():
-                        if pd.notna(req_type) and str(req_type).strip() != '':
-                            summary_row[f'{req_type} Count'] = count
-                
-                summary_data.append(summary_row)
+            grouped = df_summary_display.groupby('Division', observed=True)
             
-            # Create summary dataframe
-            summary_df = pd.DataFrame(summary_data)
+            # Count of requests
+            summary_df = grouped.size().to_frame('Total Requests')
             
-            # Add Grand Total row
-            grand_total = {'Division': 'Grand Total'}
+            # Sum of App. Claim Amt from M&M
+            if 'App. Claim Amt from M&M' in df_summary_display.columns:
+                summary_df['Total Approved Amount'] = grouped['App. Claim Amt from M&M'].sum()
+            
+            # Count by Request Type if available, most frequent first within each division
+            if 'Request Type' in df_summary_display.columns:
+                request_types = grouped['Request Type'].value_counts()
+                request_type_names = request_types.index.get_level_values('Request Type')
+                for req_type in request_type_names.unique():
+                    if str(req_type).strip() != '':
+                        summary_df[f'{req_type} Count'] = request_types[request_type_names == req_type].droplevel('Request Type')
             
-            for col in summary_df.columns:
-                if col != 'Division':
-                    if summary_df[col].dtype in ['int64', 'float64']:
-                        grand_total[col] = summary_df[col].sum()
+            summary_df = summary_df.reset_index()
             
-            summary_df = pd.concat([summary_df, pd.DataFrame([grand_total])], ignore_index=True)
+            # Add Grand Total row
+            numeric_columns = summary_df.select_dtypes(include=['int64', 'float64']).columns
+            summary_df = append_grand_total(summary_df, dict.fromkeys(numeric_columns, 'sum'))
         else:
             summary_df = pd.DataFrame()
 
@@ -151,7 +252,7 @@ def process_pr_approval():
                 print(f"  Total Approved Amount: {df_summary_display['App. Claim Amt from M&M'].sum():,.2f}")
         
         # Return summary and complete source dataframe for export
-        return summary_df, df
+        return shrink_dataframe(summary_df), shrink_dataframe(df)
 
     except FileNotFoundError:
         print(f" PR Approval file not found: {input_path}")
@@ -171,12 +272,6 @@ def process_compensation_claim():
         return None, None
     
     try:
-        # Load the data - read first sheet
-        df = pd.read_excel(input_path)
-        print(" Compensation Claim data loaded successfully")
-        print(f"  Available columns: {df.columns.tolist()[:10]}...")
-        print(f"  Total rows in source data: {len(df)}")
-
         # Required columns for the table
         required_columns = [
             'Division', 'RO Id.', 'Registration No.', 'RO Date', 'RO Bill Date',
@@ -184,6 +279,12 @@ def process_compensation_claim():
             'Claim Approved Amt.', 'No. of Days'
         ]
         
+        # Load the data - read first sheet, keeping only the required columns
+        df = read_excel_file(input_path, usecols=lambda column: column in required_columns)
+        print(" Compensation Claim data loaded successfully")
+        print(f"  Available columns: {df.columns.tolist()[:10]}...")
+        print(f"  Total rows in source data: {len(df)}")
+        
         # Check which columns exist
         available_columns = [col for col in required_columns if col in df.columns]
         missing_columns = [col for col in required_columns if col not in df.columns]
@@ -203,21 +304,11 @@ def process_compensation_claim():
         if 'Division' in df_filtered.columns:
             df_filtered['Division'] = df_filtered['Division'].astype(str).str.strip()
             df_filtered = df_filtered[df_filtered['Division'].notna() & (df_filtered['Division'] != '') & (df_filtered['Division'] != 'nan')]
+            df_filtered['Division'] = df_filtered['Division'].astype('category')
         
         # Format RO Id with "RO" prefix if column exists
         if 'RO Id.' in df_filtered.columns:
-            def format_ro_id(x):
-                if pd.isna(x) or str(x).strip() == '':
-                    return ''
-                try:
-                    return f"RO{str(int(float(x)))}"
-                except (ValueError, TypeError):
-                    value_str = str(x).strip()
-                    if not value_str.startswith('RO'):
-                        return f"RO{value_str}"
-                    return value_str
-            
-            df_filtered['RO Id.'] = df_filtered['RO Id.'].apply(format_ro_id)
+            df_filtered['RO Id.'] = format_ro_ids(df_filtered['RO Id.'])
         
         # Clean numeric columns
         numeric_cols = ['Claim Amount', 'Claim Approved Amt.', 'No. of Days']
@@ -225,51 +316,35 @@ def process_compensation_claim():
             if col in df_filtered.columns:
                 df_filtered[col] = pd.to_numeric(df_filtered[col], errors='coerce').fillna(0)
         
-        # Prepare summary by division
-        summary_data = []
-        
+        # Prepare summary by division in one grouped pass
         if 'Division' in df_filtered.columns:
-            for division in sorted(df_filtered['Division'].unique()):
-                div_data = df_filtered[df_filtered['Division'] == division]
-                
-                summary_row = {'Division': division}
-                
-                # Count of claims
-                summary_row['Total Claims'] = len(div_data)
-                
-                # Sum of Claim Amount
-                if 'Claim Amount' in df_filtered.columns:
-                    summary_row['Total Claim Amount'] = div_data['Claim Amount'].sum()
-                
-                # Sum of Claim Approved Amount
-                if 'Claim Approved Amt.' in df_filtered.columns:
-                    summary_row['Total Approved Amount'] = div_data['Claim Approved Amt.'].sum()
-                
-                # Average No. of Days
-                if 'No. of Days' in df_filtered.columns:
-                    summary_row['Avg No. of Days'] = div_data['No. of Days'].mean()
-                
-                summary_data.append(summary_row)
+            grouped = df_filtered.groupby('Division', observed=True)
             
-            # Create summary dataframe
-            summary_df = pd.DataFrame(summary_data)
+            # Count of claims
+            summary_df = grouped.size().to_frame('Total Claims')
             
-            # Add Grand Total row
-            grand_total = {'Division': 'Grand Total'}
-            
-            if 'Total Claims' in summary_df.columns:
-                grand_total['Total Claims'] = summary_df['Total Claims'].sum()
+            # Sum of Claim Amount
+            if 'Claim Amount' in df_filtered.columns:
+                summary_df['Total Claim Amount'] = grouped['Claim Amount'].sum()
             
-            if 'Total Claim Amount' in summary_df.columns:
-                grand_total['Total Claim Amount'] = summary_df['Total Claim Amount'].sum()
+            # Sum of Claim Approved Amount
+            if 'Claim Approved Amt.' in df_filtered.columns:
+                summary_df['Total Approved Amount'] = grouped['Claim Approved Amt.'].sum()
             
-            if 'Total Approved Amount' in summary_df.columns:
-                grand_total['Total Approved Amount'] = summary_df['Total Approved Amount'].sum()
+            # Average No. of Days
+            if 'No. of Days' in df_filtered.columns:
+                summary_df['Avg No. of Days'] = grouped['No. of Days'].mean()
             
-            if 'Avg No. of Days' in summary_df.columns:
-                grand_total['Avg No. of Days'] = summary_df['Avg No. of Days'].mean()
+            summary_df = summary_df.reset_index()
             
-            summary_df = pd.concat([summary_df, pd.DataFrame([grand_total])], ignore_index=True)
+            # Add Grand Total row: counts and amounts are summed, the day average is averaged
+            grand_total_aggregations = {
+                'Total Claims': 'sum',
+                'Total Claim Amount': 'sum',
+                'Total Approved Amount': 'sum',
+                'Avg No. of Days': 'mean'
+            }
+            summary_df = append_grand_total(summary_df, {col: how for col, how in grand_total_aggregations.items() if col in summary_df.columns})
         else:
             summary_df = pd.DataFrame()
 
@@ -279,7 +354,7 @@ def process_compensation_claim():
             if 'Claim Amount' in df_filtered.columns:
                 print(f"  Total Claim Amount: {df_filtered['Claim Amount'].sum():,.2f}")
         
-        return summary_df, df_filtered
+        return shrink_dataframe(summary_df), shrink_dataframe(df_filtered)
 
     except FileNotFoundError:
         print(f" Compensation Claim file not found: {input_path}")
@@ -300,7 +375,7 @@ def process_current_month_warranty():
     
     try:
         # Load the data - sheet name is "Pending Warranty Claim Details"
-        df = pd.read_excel(input_path, sheet_name='Pending Warranty Claim Details')
+        df = read_excel_file(input_path, sheet_name='Pending Warranty Claim Details')
         print(" Current Month Warranty data loaded successfully")
         print(f"  Available columns: {df.columns.tolist()[:10]}...")
         print(f"  Total rows in source data: {len(df)}")
@@ -319,43 +394,23 @@ def process_current_month_warranty():
         
         # Remove any empty or NaN divisions
         df = df[df['Division'].notna() & (df['Division'] != '') & (df['Division'] != 'nan')]
+        df['Division'] = df['Division'].astype('category')
 
-        # Prepare summary by division
-        summary_data = []
-        
-        for division in sorted(df['Division'].unique()):
-            div_data = df[df['Division'] == division]
-            
-            # Count non-empty Pending Claims Spares
-            spares_count = div_data['Pending Claims Spares'].notna().sum()
-            
-            # Count non-empty Pending Claims Labour
-            labour_count = div_data['Pending Claims Labour'].notna().sum()
-            
-            summary_data.append({
-                'Division': division,
-                'Pending Claims Spares Count': spares_count,
-                'Pending Claims Labour Count': labour_count,
-                'Total Pending Claims': spares_count + labour_count
-            })
-        
-        # Create summary dataframe
-        summary_df = pd.DataFrame(summary_data)
+        # Prepare summary by division: count() counts the non-empty claims per division
+        summary_df = df.groupby('Division', observed=True)[['Pending Claims Spares', 'Pending Claims Labour']].count()
+        summary_df.columns = ['Pending Claims Spares Count', 'Pending Claims Labour Count']
+        summary_df['Total Pending Claims'] = summary_df['Pending Claims Spares Count'] + summary_df['Pending Claims Labour Count']
+        summary_df = summary_df.reset_index()
         
         # Add Grand Total row
-        grand_total = {
-            'Division': 'Grand Total',
-            'Pending Claims Spares Count': summary_df['Pending Claims Spares Count'].sum(),
-            'Pending Claims Labour Count': summary_df['Pending Claims Labour Count'].sum(),
-            'Total Pending Claims': summary_df['Total Pending Claims'].sum()
-        }
-        summary_df = pd.concat([summary_df, pd.DataFrame([grand_total])], ignore_index=True)
+        summary_df = append_grand_total(summary_df, dict.fromkeys(summary_df.columns[1:], 'sum'))
+        grand_total = summary_df.iloc[-1]
 
         print("\n Current Month Warranty processing completed successfully")
         print(f"  Total Pending Claims Spares: {grand_total['Pending Claims Spares Count']}")
         print(f"  Total Pending Claims Labour: {grand_total['Pending Claims Labour Count']}")
         
-        return summary_df, df
+        return shrink_dataframe(summary_df), shrink_dataframe(df)
 
     except FileNotFoundError:
         print(f" Current Month Warranty file not found: {input_path}")
@@ -366,6 +421,19 @@ def process_current_month_warranty():
         traceback.print_exc()
         return None, None
 
+def monthly_dealer_table(monthly_sums, label, dealers, months):
+    """Lay out per-dealer monthly sums (Dealer_Code x Month) as a table with one '<label> <month>' column per month"""
+    table = pd.DataFrame({'Division': dealers})
+    
+    for month in months:
+        if month in monthly_sums.columns:
+            table[f'{label} {month}'] = monthly_sums[month].reindex(dealers).to_numpy()
+            print(f"    {month}: {monthly_sums[month].sum():,.2f}")
+        else:
+            table[f'{label} {month}'] = 0
+    
+    return table.fillna(0)
+
 def process_warranty_data():
     """Process warranty data and return credit, debit, and arbitration dataframes"""
     input_path = find_data_file('Warranty Debit.xlsx')
@@ -375,8 +443,8 @@ def process_warranty_data():
         return None, None, None, None
     
     try:
-        # Load the data
-        df = pd.read_excel(input_path, sheet_name='Sheet1')
+        # Load the data, dropping columns no table or export uses
+        df = read_excel_file(input_path, sheet_name='Sheet1', usecols=lambda column: column in WARRANTY_SOURCE_COLUMNS)
         print(" Warranty data loaded successfully")
         print(f"  Available columns: {df.columns.tolist()[:5]}...")
         print(f"  Total rows in source data: {len(df)}")
@@ -405,10 +473,10 @@ def process_warranty_data():
         print(f"    Total Debit Note: {df['Debit Note Amount'].sum():,.2f}")
 
         # Apply dealer mapping
-        df['Dealer_Code'] = df['Dealer Location'].map(dealer_mapping).fillna(df['Dealer Location'])
+        df['Dealer_Code'] = df['Dealer Location'].map(dealer_mapping).fillna(df['Dealer Location']).astype('category')
 
-        # Extract month from 'Fiscal Month'
-        df['Month'] = df['Fiscal Month'].astype(str).str.strip().str[:3]
+        # Extract month from 'Fiscal Month' as an ordered categorical; unknown months become NaN
+        df['Month'] = pd.Categorical(df['Fiscal Month'].astype(str).str.strip().str[:3], categories=FISCAL_MONTHS, ordered=True)
 
         # Ensure 'Claim arbitration ID' is clean
         df['Claim arbitration ID'] = df['Claim arbitration ID'].astype(str).replace('nan', '').replace('', np.nan)
@@ -417,74 +485,36 @@ def process_warranty_data():
         dealers = sorted(df['Dealer_Code'].unique())
         months = ['Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
 
+        # Debit is counted as arbitration when the claim has an 'ARB...' arbitration ID
+        arbitration_ids = df['Claim arbitration ID'].astype(str).str.strip().str.upper()
+        is_arb = arbitration_ids.str.startswith('ARB') & (arbitration_ids != 'NAN')
+        
+        # One grouped pass sums credit, debit and arbitration per dealer and month for all three tables
+        monthly_sums = df[['Dealer_Code', 'Month', 'Credit Note Amount', 'Debit Note Amount']].assign(
+            Arbitration_Amount=df['Debit Note Amount'].where(is_arb.to_numpy(), 0)
+        ).groupby(['Dealer_Code', 'Month'], observed=True).sum()
+
         # 1. CREDIT NOTE TABLE
-        credit_df = pd.DataFrame({'Division': dealers})
         print("\n  Processing Credit Note Amounts...")
-        for month in months:
-            month_data = df[df['Month'] == month]
-            if not month_data.empty:
-                summary = month_data.groupby('Dealer_Code')['Credit Note Amount'].sum().reset_index()
-                summary.columns = ['Division', f'Credit Note {month}']
-                credit_df = credit_df.merge(summary, on='Division', how='left')
-                print(f"    {month}: {month_data['Credit Note Amount'].sum():,.2f}")
-            else:
-                credit_df[f'Credit Note {month}'] = 0
-        
-        credit_df = credit_df.fillna(0)
+        credit_df = monthly_dealer_table(monthly_sums['Credit Note Amount'].unstack('Month'), 'Credit Note', dealers, months)
         credit_columns = [f'Credit Note {month}' for month in months]
         credit_df['Total Credit'] = credit_df[credit_columns].sum(axis=1)
         
         # Add Grand Total row
-        grand_total_credit = {'Division': 'Grand Total'}
-        for col in credit_df.columns[1:]:
-            grand_total_credit[col] = credit_df[col].sum()
-        credit_df = pd.concat([credit_df, pd.DataFrame([grand_total_credit])], ignore_index=True)
+        credit_df = append_grand_total(credit_df, dict.fromkeys(credit_df.columns[1:], 'sum'))
 
         # 2. DEBIT NOTE TABLE
-        debit_df = pd.DataFrame({'Division': dealers})
         print("\n  Processing Debit Note Amounts...")
-        for month in months:
-            month_data = df[df['Month'] == month]
-            if not month_data.empty:
-                summary = month_data.groupby('Dealer_Code')['Debit Note Amount'].sum().reset_index()
-                summary.columns = ['Division', f'Debit Note {month}']
-                debit_df = debit_df.merge(summary, on='Division', how='left')
-                print(f"    {month}: {month_data['Debit Note Amount'].sum():,.2f}")
-            else:
-                debit_df[f'Debit Note {month}'] = 0
-        
-        debit_df = debit_df.fillna(0)
+        debit_df = monthly_dealer_table(monthly_sums['Debit Note Amount'].unstack('Month'), 'Debit Note', dealers, months)
         debit_columns = [f'Debit Note {month}' for month in months]
         debit_df['Total Debit'] = debit_df[debit_columns].sum(axis=1)
         
         # Add Grand Total row
-        grand_total_debit = {'Division': 'Grand Total'}
-        for col in debit_df.columns[1:]:
-            grand_total_debit[col] = debit_df[col].sum()
-        debit_df = pd.concat([debit_df, pd.DataFrame([grand_total_debit])], ignore_index=True)
+        debit_df = append_grand_total(debit_df, dict.fromkeys(debit_df.columns[1:], 'sum'))
 
         # 3. CLAIM ARBITRATION TABLE
-        arbitration_df = pd.DataFrame({'Division': dealers})
         print("\n  Processing Claim Arbitration...")
-        
-        def is_arbitration(value):
-            if pd.isna(value): return False
-            value = str(value).strip().upper()
-            return value.startswith('ARB') and value != 'NAN'
-
-        for month in months:
-            month_data = df[df['Month'] == month].copy()
-            month_data['Is_ARB'] = month_data['Claim arbitration ID'].apply(is_arbitration)
-            month_data['Arbitration_Amount'] = month_data.apply(
-                lambda row: row['Debit Note Amount'] if row['Is_ARB'] else 0,
-                axis=1
-            )
-            arb_summary = month_data.groupby('Dealer_Code')['Arbitration_Amount'].sum().reset_index()
-            arb_summary.columns = ['Division', f'Claim Arbitration {month}']
-            arbitration_df = arbitration_df.merge(arb_summary, on='Division', how='left')
-            print(f"    {month}: {month_data['Arbitration_Amount'].sum():,.2f}")
-        
-        arbitration_df = arbitration_df.fillna(0)
+        arbitration_df = monthly_dealer_table(monthly_sums['Arbitration_Amount'].unstack('Month'), 'Claim Arbitration', dealers, months)
         
         # Calculate Pending Claim Arbitration
         arbitration_cols = [f'Claim Arbitration {m}' for m in months]
@@ -501,13 +531,14 @@ def process_warranty_data():
         arbitration_df = arbitration_df.drop('Total Debit', axis=1)
         
         # Add Grand Total row
-        grand_total_arb = {'Division': 'Grand Total'}
-        for col in arbitration_df.columns[1:]:
-            grand_total_arb[col] = arbitration_df[col].sum()
-        arbitration_df = pd.concat([arbitration_df, pd.DataFrame([grand_total_arb])], ignore_index=True)
+        arbitration_df = append_grand_total(arbitration_df, dict.fromkeys(arbitration_df.columns[1:], 'sum'))
+
+        # Store the source rows in fiscal-month order so every export filter comes out already sorted
+        df = df.sort_values('Month', kind='stable')
 
         print("\n Warranty data processing completed successfully")
-        return credit_df, debit_df, arbitration_df, df
+        return (shrink_dataframe(credit_df), shrink_dataframe(debit_df),
+                shrink_dataframe(arbitration_df), shrink_dataframe(df))
 
     except FileNotFoundError:
         print(f" Warranty file not found: {input_path}")
@@ -562,6 +593,9 @@ print("Loading Mahindra vehicle images...")
 MAHINDRA_IMAGES = get_mahindra_images()
 print(f" Loaded {len(MAHINDRA_IMAGES)} vehicle images\n")
 
+# Images never change while the server runs, so serialize the response once
+VEHICLE_IMAGES_JSON = orjson.dumps({"images": [{'name': img['name'], 'data': img['data']} for img in MAHINDRA_IMAGES]})
+
 # ==================== AUTHENTICATION SETUP ====================
 
 def update_user_password_in_excel(user_id: str, new_password: str):
@@ -1096,6 +1130,7 @@ DASHBOARD_HTML = """
             margin-top: 20px;
             font-size: 12px;
             overflow-x: auto;
+            contain: content;
         }
         
         .data-table thead th {
@@ -1165,6 +1200,9 @@ DASHBOARD_HTML = """
         
         .table-wrapper {
             overflow-x: auto;
+            /* Skip layout and paint for tables scrolled out of view */
+            content-visibility: auto;
+            contain-intrinsic-size: auto 500px;
         }
         
         .modal {
@@ -1432,12 +1470,12 @@ DASHBOARD_HTML = """
             <div id="warrantyTabs" style="display: none;">
                 <!-- Tab Navigation -->
                 <div class="nav-tabs">
-                    <button class="nav-link active" onclick="switchTab('credit')"> Warranty Credit</button>
-                    <button class="nav-link" onclick="switchTab('debit')"> Warranty Debit</button>
-                    <button class="nav-link" onclick="switchTab('arbitration')"> Claim Arbitration</button>
-                    <button class="nav-link" onclick="switchTab('currentmonth')"> Current Month Warranty</button>
-                    <button class="nav-link" onclick="switchTab('compensation')"> Compensation Claim</button>
-                    <button class="nav-link" onclick="switchTab('pr_approval')"> PR Approval</button>
+                    <button class="nav-link active" onclick="switchTab('credit', this)"> Warranty Credit</button>
+                    <button class="nav-link" onclick="switchTab('debit', this)"> Warranty Debit</button>
+                    <button class="nav-link" onclick="switchTab('arbitration', this)"> Claim Arbitration</button>
+                    <button class="nav-link" onclick="switchTab('currentmonth', this)"> Current Month Warranty</button>
+                    <button class="nav-link" onclick="switchTab('compensation', this)"> Compensation Claim</button>
+                    <button class="nav-link" onclick="switchTab('pr_approval', this)"> PR Approval</button>
                 </div>
 
                 <!-- EXPORT SECTION -->
@@ -1541,7 +1579,7 @@ DASHBOARD_HTML = """
     
     
     <script>
-        let warrantyData = {};
+        let exportDivisions = {};
         
         async function loadDashboard() {
             const spinner = document.getElementById('loadingSpinner');
@@ -1552,10 +1590,13 @@ DASHBOARD_HTML = """
             
             try {
                 console.log('========== DASHBOARD LOAD START ==========');
-                console.log(' Fetching warranty data with credentials...');
+                console.log(' Fetching export divisions with credentials...');
                 console.log(' Current cookies:', document.cookie);
                 
-                const response = await fetch('/api/warranty-data', {
+                const tablesLoaded = ensureTableLoaded(document.querySelector('.tab-content.active').id);
+                
+                // Tables come from /api/warranty-html; only the export filter options are needed here
+                const response = await fetch('/api/divisions', {
                     method: 'GET',
                     credentials: 'include',
                     headers: {
@@ -1577,18 +1618,13 @@ DASHBOARD_HTML = """
                 if (!response.ok) {
                     const text = await response.text();
                     console.error(' Response not OK:', response.status);
-                    throw new Error('Failed to load warranty data: HTTP ' + response.status);
+                    throw new Error('Failed to load divisions: HTTP ' + response.status);
                 }
                 
-                warrantyData = await response.json();
-                console.log(' Warranty data loaded successfully');
+                exportDivisions = await response.json();
+                console.log(' Export divisions loaded successfully');
                 
-                displayCreditTable(warrantyData.credit);
-                displayDebitTable(warrantyData.debit);
-                displayArbitrationTable(warrantyData.arbitration);
-                displayCurrentMonthTable(warrantyData.currentMonth);
-                displayCompensationTable(warrantyData.compensation);
-                displayPrApprovalTable(warrantyData.prApproval);
+                await tablesLoaded;
                 
                 loadDivisions();
                 
@@ -1601,155 +1637,74 @@ DASHBOARD_HTML = """
             }
         }
         
-        function displayCreditTable(data) {
-            if (!data || data.length === 0) return;
-            
-            const table = document.getElementById('creditTable');
-            const headers = Object.keys(data[0]);
-            
-            const headerRow = table.querySelector('thead');
-            headerRow.innerHTML = headers.map(h => '<th>' + h + '</th>').join('');
-            
-            const tbody = table.querySelector('tbody');
-            tbody.innerHTML = data.map((row) => {
-                return '<tr>' + headers.map((h) => {
-                    const value = typeof row[h] === 'number' ? row[h].toLocaleString('en-IN', {maximumFractionDigits: 0}) : row[h];
-                    return '<td>' + value + '</td>';
-                }).join('') + '</tr>';
-            }).join('');
-        }
+        const TABLE_CONFIG = [
+            { key: 'credit', tabId: 'credit', tableId: 'creditTable' },
+            { key: 'debit', tabId: 'debit', tableId: 'debitTable' },
+            { key: 'arbitration', tabId: 'arbitration', tableId: 'arbitrationTable' },
+            { key: 'currentMonth', tabId: 'currentmonth', tableId: 'currentMonthTable' },
+            { key: 'compensation', tabId: 'compensation', tableId: 'compensationTable' },
+            { key: 'prApproval', tabId: 'pr_approval', tableId: 'prApprovalTable' }
+        ];
         
-        function displayDebitTable(data) {
-            if (!data || data.length === 0) return;
-            
-            const table = document.getElementById('debitTable');
-            const headers = Object.keys(data[0]);
-            
-            const headerRow = table.querySelector('thead');
-            headerRow.innerHTML = headers.map(h => '<th>' + h + '</th>').join('');
-            
-            const tbody = table.querySelector('tbody');
-            tbody.innerHTML = data.map((row) => {
-                return '<tr>' + headers.map((h) => {
-                    const value = typeof row[h] === 'number' ? row[h].toLocaleString('en-IN', {maximumFractionDigits: 0}) : row[h];
-                    return '<td>' + value + '</td>';
-                }).join('') + '</tr>';
-            }).join('');
-        }
+        // Pending or finished table loads by tab id; a table is only fetched the first time its tab is shown
+        const tableLoads = new Map();
         
-        function displayArbitrationTable(data) {
-            if (!data || data.length === 0) return;
-            
-            const table = document.getElementById('arbitrationTable');
-            const headers = Object.keys(data[0]);
-            
-            const headerRow = table.querySelector('thead');
-            headerRow.innerHTML = headers.map(h => '<th>' + h + '</th>').join('');
-            
-            const tbody = table.querySelector('tbody');
-            tbody.innerHTML = data.map((row) => {
-                return '<tr>' + headers.map((h) => {
-                    const value = typeof row[h] === 'number' ? row[h].toLocaleString('en-IN', {maximumFractionDigits: 0}) : row[h];
-                    return '<td>' + value + '</td>';
-                }).join('') + '</tr>';
-            }).join('');
+        // Tables arrive rendered and formatted from the server; one innerHTML assignment per table
+        async function loadTable(config) {
+            const response = await fetch('/api/warranty-html/' + config.key, {credentials: 'include'});
+            if (!response.ok) {
+                throw new Error('Failed to load ' + config.key + ' table: HTTP ' + response.status);
+            }
+            document.getElementById(config.tableId).innerHTML = await response.text();
         }
         
-        function displayCurrentMonthTable(data) {
-            if (!data || data.length === 0) return;
-            
-            const table = document.getElementById('currentMonthTable');
-            const headers = Object.keys(data[0]);
+        function ensureTableLoaded(tabId) {
+            const config = TABLE_CONFIG.find(c => c.tabId === tabId);
+            if (!config) return Promise.resolve();
             
-            const headerRow = table.querySelector('thead');
-            headerRow.innerHTML = headers.map(h => '<th>' + h + '</th>').join('');
-            
-            const tbody = table.querySelector('tbody');
-            tbody.innerHTML = data.map((row) => {
-                return '<tr>' + headers.map((h) => {
-                    const value = typeof row[h] === 'number' ? row[h].toLocaleString('en-IN', {maximumFractionDigits: 0}) : row[h];
-                    return '<td>' + value + '</td>';
-                }).join('') + '</tr>';
-            }).join('');
+            if (!tableLoads.has(tabId)) {
+                // Forget failed loads so the next tab switch retries
+                tableLoads.set(tabId, loadTable(config).catch(error => {
+                    tableLoads.delete(tabId);
+                    throw error;
+                }));
+            }
+            return tableLoads.get(tabId);
         }
         
-        function displayCompensationTable(data) {
-            if (!data || data.length === 0) return;
-            
-            const table = document.getElementById('compensationTable');
-            const headers = Object.keys(data[0]);
-            
-            const headerRow = table.querySelector('thead');
-            headerRow.innerHTML = headers.map(h => '<th>' + h + '</th>').join('');
-            
-            const tbody = table.querySelector('tbody');
-            tbody.innerHTML = data.map((row) => {
-                return '<tr>' + headers.map((h) => {
-                    const value = typeof row[h] === 'number' ? row[h].toLocaleString('en-IN', {maximumFractionDigits: 2}) : row[h];
-                    return '<td>' + value + '</td>';
-                }).join('') + '</tr>';
-            }).join('');
-        }
+        // Currently active tab panel and nav button; looked up once, then tracked on each switch
+        let activeTab = null;
+        let activeLink = null;
         
-        function displayPrApprovalTable(data) {
-            if (!data || data.length === 0) return;
-            
-            const table = document.getElementById('prApprovalTable');
-            const headers = Object.keys(data[0]);
+        function switchTab(tabName, link) {
+            ensureTableLoaded(tabName).catch(error => console.error(' Error loading table:', error));
             
-            const headerRow = table.querySelector('thead');
-            headerRow.innerHTML = headers.map(h => '<th>' + h + '</th>').join('');
+            activeTab = activeTab || document.querySelector('.tab-content.active');
+            activeLink = activeLink || document.querySelector('.nav-link.active');
             
-            const tbody = table.querySelector('tbody');
-            tbody.innerHTML = data.map((row) => {
-                return '<tr>' + headers.map((h) => {
-                    const value = typeof row[h] === 'number' ? row[h].toLocaleString('en-IN', {maximumFractionDigits: 2}) : row[h];
-                    return '<td>' + value + '</td>';
-                }).join('') + '</tr>';
-            }).join('');
-        }
-        
-        function switchTab(tabName) {
-            document.querySelectorAll('.tab-content').forEach(tab => {
-                tab.classList.remove('active');
-            });
+            if (activeTab) activeTab.classList.remove('active');
+            if (activeLink) activeLink.classList.remove('active');
             
-            document.querySelectorAll('.nav-link').forEach(btn => {
-                btn.classList.remove('active');
-            });
-            
-            document.getElementById(tabName).classList.add('active');
-            event.target.classList.add('active');
+            activeTab = document.getElementById(tabName);
+            activeLink = link;
+            activeTab.classList.add('active');
+            activeLink.classList.add('active');
         }
 
         // ===== EXPORT FUNCTIONS =====
         function loadDivisions() {
-            console.log(' Loading divisions from warranty data...');
-            const divisions = new Set();
-            
+            console.log(' Loading divisions for export type...');
             const currentType = document.getElementById('exportType').value;
-            let dataSource = warrantyData.credit;
             
-            if (currentType === 'debit') dataSource = warrantyData.debit;
-            if (currentType === 'arbitration') dataSource = warrantyData.arbitration;
-            if (currentType === 'currentmonth') dataSource = warrantyData.currentMonth;
-            if (currentType === 'compensation') dataSource = warrantyData.compensation;
-            if (currentType === 'pr_approval') dataSource = warrantyData.prApproval;
-            
-            if (dataSource && dataSource.length > 0) {
-                dataSource.forEach(row => {
-                    if (row.Division && row.Division !== 'Grand Total') {
-                        divisions.add(row.Division);
-                    }
-                });
-            }
+            // Sorted division lists are precomputed per export type by the server
+            const divisions = exportDivisions[currentType] || [];
             
             const divisionSelect = document.getElementById('divisionFilter');
             const currentValue = divisionSelect.value;
             
             divisionSelect.innerHTML = '<option value="">-- Select Division --</option><option value="All">All Divisions</option>';
             
-            Array.from(divisions).sort().forEach(div => {
+            divisions.forEach(div => {
                 const option = document.createElement('option');
                 option.value = div;
                 option.textContent = div;
@@ -1760,12 +1715,14 @@ DASHBOARD_HTML = """
                 divisionSelect.value = currentValue;
             }
             
-            console.log(' Divisions loaded:', Array.from(divisions).length);
+            console.log(' Divisions loaded:', divisions.length);
         }
 
         // Listen for export type changes
         document.getElementById('exportType')?.addEventListener('change', loadDivisions);
 
+        const XLSX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet';
+        
         async function exportToExcel() {
             const division = document.getElementById('divisionFilter').value;
             const type = document.getElementById('exportType').value;
@@ -1781,6 +1738,28 @@ DASHBOARD_HTML = """
             exportBtn.textContent = '⏳ Exporting...';
             
             try {
+                const filename = `${type}_${division}_${new Date().toISOString().split('T')[0]}.xlsx`;
+                
+                // Ask for the save location first, while the click still counts as a user gesture
+                let fileHandle = null;
+                if ('showSaveFilePicker' in window) {
+                    try {
+                        fileHandle = await window.showSaveFilePicker({
+                            suggestedName: filename,
+                            types: [{
+                                description: 'Excel Workbook',
+                                accept: {[XLSX_MIME_TYPE]: ['.xlsx']}
+                            }]
+                        });
+                    } catch (error) {
+                        if (error.name === 'AbortError') {
+                            console.log(' Export cancelled');
+                            return;
+                        }
+                        fileHandle = null;
+                    }
+                }
+                
                 const response = await fetch('/api/export-to-excel', {
                     method: 'POST',
                     headers: {
@@ -1798,15 +1777,21 @@ DASHBOARD_HTML = """
                     throw new Error(error.detail || 'Export failed');
                 }
                 
-                const blob = await response.blob();
-                const url = window.URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = `${type}_${division}_${new Date().toISOString().split('T')[0]}.xlsx`;
-                document.body.appendChild(a);
-                a.click();
-                window.URL.revokeObjectURL(url);
-                document.body.removeChild(a);
+                if (fileHandle) {
+                    // Write the workbook to disk as it arrives instead of buffering it in memory
+                    const writable = await fileHandle.createWritable();
+                    await response.body.pipeTo(writable);
+                } else {
+                    const blob = new Blob([await response.arrayBuffer()], {type: XLSX_MIME_TYPE});
+                    const url = window.URL.createObjectURL(blob);
+                    const a = document.createElement('a');
+                    a.href = url;
+                    a.download = filename;
+                    document.body.appendChild(a);
+                    a.click();
+                    window.URL.revokeObjectURL(url);
+                    document.body.removeChild(a);
+                }
                 
                 console.log(' Export completed successfully');
                 alert(' Export completed successfully!');
@@ -1832,7 +1817,73 @@ DASHBOARD_HTML = """
 
 # ==================== FASTAPI SETUP ====================
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
+
+# Versioned static files never change under the same URL, so browsers may keep them for a year
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+STATIC_ASSETS = {}
+
+def fingerprint_asset(page, tag, extension, media_type):
+    """Move an inline <style> or <script> block to a versioned static URL and reference it from the page"""
+    start = page.index(f'<{tag}>')
+    end = page.index(f'</{tag}>', start)
+    content = page[start + len(tag) + 2:end].encode()
+    version = hashlib.sha1(content).hexdigest()[:12]
+    name = f"dashboard.{version}.{extension}"
+    STATIC_ASSETS[name] = (content, gzip.compress(content, 9), f'"{version}"', media_type)
+    
+    if tag == 'style':
+        reference = f'<link rel="stylesheet" href="/static/{name}">'
+    else:
+        reference = f'<script src="/static/{name}"></script>'
+    return page[:start] + reference + page[end + len(tag) + 3:]
+
+# The stylesheet and script make up most of the page; only the small shell is revalidated on each visit
+DASHBOARD_PAGE = fingerprint_asset(DASHBOARD_HTML, 'style', 'css', 'text/css')
+DASHBOARD_PAGE = fingerprint_asset(DASHBOARD_PAGE, 'script', 'js', 'application/javascript')
+
+# The dashboard page is static, so compress and fingerprint it once at the highest level
+DASHBOARD_HTML_BYTES = DASHBOARD_PAGE.encode()
+DASHBOARD_HTML_GZ = gzip.compress(DASHBOARD_HTML_BYTES, 9)
+DASHBOARD_HTML_ETAG = f'"{hashlib.sha1(DASHBOARD_HTML_BYTES).hexdigest()}"'
+# The page sits behind the login flow and names the current asset hashes, so every visit
+# revalidates it through the ETag; a stale copy would request assets that no longer exist
+HTML_CACHE_CONTROL = "private, no-cache"
+
+# Data and page only change when the data is (re)loaded, so that time serves as Last-Modified
+LAST_MODIFIED = formatdate(usegmt=True)
+
+def etag_matches(if_none_match, etag):
+    """Check an If-None-Match header against a strong ETag, using the weak comparison GET requires"""
+    # The header may list several tags or be '*'; W/ prefixes are ignored for If-None-Match
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag.removeprefix('W/') == etag:
+            return True
+    return False
+
+def cached_response(request: Request, content, content_gz, media_type, etag, cache_control):
+    """Answer 304 when the client's copy is still current, otherwise send the encoded body"""
+    # The gzip and identity bodies differ byte for byte, so each gets its own strong validator
+    use_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    if use_gzip:
+        etag = etag[:-1] + '-gz"'
+    headers = {"ETag": etag, "Last-Modified": LAST_MODIFIED, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        not_modified = etag_matches(if_none_match, etag)
+    else:
+        not_modified = request.headers.get('if-modified-since') == LAST_MODIFIED
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    
+    # Pre-compressed bytes go to clients that accept gzip, raw bytes otherwise
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=content_gz, media_type=media_type, headers=headers)
+    return Response(content=content, media_type=media_type, headers=headers)
 
 # ==================== API ENDPOINTS ====================
 
@@ -1879,6 +1930,198 @@ async def change_password(request: Request, session_id: str = Cookie(None)):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+# ==================== EXCEL EXPORT HELPERS ====================
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+RESPONSE_CACHE_CONTROL = "private, max-age=300, must-revalidate"
+
+# Export layout for each export type. Types with detail_sheets are built by build_summary_workbook;
+# credit/debit/arbitration need dealer-level source filtering and use build_warranty_workbook.
+EXPORT_REGISTRY = {
+    'credit': {
+        'file_label': 'credit',
+        'summary_key': 'credit_df'
+    },
+    'debit': {
+        'file_label': 'debit',
+        'summary_key': 'debit_df'
+    },
+    'arbitration': {
+        'file_label': 'arbitration',
+        'summary_key': 'arbitration_df'
+    },
+    'currentmonth': {
+        'file_label': 'CurrentMonthWarranty',
+        'name': 'Current Month Warranty',
+        'summary_key': 'current_month_df',
+        'source_key': 'current_month_source_df',
+        'summary_title': 'Current Month Summary',
+        'number_format': '#,##0',
+        'missing_message': 'No current month warranty data available',
+        'detail_sheets': [
+            {'suffix': 'Spares', 'title': 'Pending Spares Claims', 'required_column': 'Pending Claims Spares'},
+            {'suffix': 'Labour', 'title': 'Pending Labour Claims', 'required_column': 'Pending Claims Labour'}
+        ]
+    },
+    'compensation': {
+        'file_label': 'CompensationClaim',
+        'name': 'Compensation Claim',
+        'summary_key': 'compensation_df',
+        'source_key': 'compensation_source_df',
+        'summary_title': 'Compensation Summary',
+        'number_format': '#,##0.00',
+        'missing_message': 'No compensation claim data available',
+        'detail_sheets': [
+            {'suffix': 'Details', 'title': 'Compensation Details', 'text_columns': ('RO Id.',)}
+        ]
+    },
+    'pr_approval': {
+        'file_label': 'PrApproval',
+        'name': 'PR Approval',
+        'summary_key': 'pr_approval_df',
+        'source_key': 'pr_approval_source_df',
+        'summary_title': 'PR Approval Summary',
+        'number_format': '#,##0.00',
+        'missing_message': 'No PR Approval data available',
+        'detail_sheets': [
+            {'suffix': 'Details', 'title': 'PR Approval Details'}
+        ]
+    }
+}
+
+THIN_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+
+# Named cell styles shared by every export; registered once per workbook and applied by name
+EXPORT_STYLES = {
+    'export_header': {
+        'fill': PatternFill(start_color="FF8C00", end_color="FF8C00", fill_type="solid"),
+        'font': Font(bold=True, color="FFFFFF", size=12),
+        'border': THIN_BORDER,
+        'alignment': Alignment(horizontal='center', vertical='center', wrap_text=True)
+    },
+    'export_text': {
+        'font': DEFAULT_FONT,
+        'border': THIN_BORDER,
+        'alignment': Alignment(horizontal='left', vertical='center')
+    },
+    'export_amount': {
+        'font': DEFAULT_FONT,
+        'border': THIN_BORDER,
+        'alignment': Alignment(horizontal='right', vertical='center'),
+        'number_format': '#,##0.00'
+    },
+    'export_count': {
+        'font': DEFAULT_FONT,
+        'border': THIN_BORDER,
+        'alignment': Alignment(horizontal='right', vertical='center'),
+        'number_format': '#,##0'
+    },
+    'export_date': {
+        'font': DEFAULT_FONT,
+        'border': THIN_BORDER,
+        'alignment': Alignment(horizontal='center', vertical='center'),
+        'number_format': 'mm-dd-yyyy'
+    }
+}
+
+# Named style used for numeric cells for each number format
+NUMBER_STYLES = {
+    '#,##0.00': 'export_amount',
+    '#,##0': 'export_count'
+}
+
+def new_export_workbook():
+    """Create a write-only workbook with the export cell styles registered"""
+    wb = Workbook(write_only=True)
+    for name, attributes in EXPORT_STYLES.items():
+        wb.add_named_style(NamedStyle(name=name, **attributes))
+    return wb
+
+def write_sheet(wb, title, df, number_format='#,##0.00', max_width=30, text_columns=(), summary=False):
+    """Append a styled DataFrame to a write-only workbook as a new sheet"""
+    ws = wb.create_sheet(title=title)
+    
+    # Column widths must be set before the first row is written; only distinct values need measuring.
+    # np.char.str_len measures them in one vectorized call without the pandas .str accessor, whose
+    # cached reference cycle kept each column's temporary strings alive until the next garbage collection.
+    # An empty sheet has no values to measure, so its widths come from the headers alone
+    for col_idx, column in enumerate(df.columns, 1):
+        value_lengths = np.char.str_len(df[column].drop_duplicates().astype(str).to_numpy(dtype=str))
+        max_length = min(max(
+            value_lengths.max() if value_lengths.size else 0,
+            len(str(column))
+        ) + 2, max_width)
+        ws.column_dimensions[get_column_letter(col_idx)].width = max_length
+    
+    # Write headers
+    header = []
+    for column in df.columns:
+        cell = WriteOnlyCell(ws, value=column)
+        cell.style = 'export_header'
+        header.append(cell)
+    ws.append(header)
+    
+    # Appended rows are serialized immediately, so each column keeps one cell per cell type,
+    # styled once by its registered named style, and reuses it for every row
+    def styled_cells(style_name):
+        cells = []
+        for _ in df.columns:
+            cell = WriteOnlyCell(ws)
+            cell.style = style_name
+            cells.append(cell)
+        return cells
+    
+    text_cells = styled_cells('export_text')
+    number_cells = styled_cells(NUMBER_STYLES[number_format])
+    date_cells = styled_cells('export_date')
+    
+    # Numeric and datetime64 columns hold a single kind of value, so their cell is chosen once;
+    # text and object columns are still checked value by value
+    text_flags = [column in text_columns for column in df.columns]
+    fixed_cells = []
+    for col_idx, (is_text, dtype) in enumerate(zip(text_flags, df.dtypes)):
+        if is_text or not isinstance(dtype, np.dtype):
+            fixed_cells.append(None)
+        elif dtype.kind in 'biuf':
+            fixed_cells.append(number_cells[col_idx])
+        elif dtype.kind == 'M' and not summary:
+            fixed_cells.append(date_cells[col_idx])
+        else:
+            fixed_cells.append(None)
+    
+    # Write data row by row as plain tuples; each row is flushed to the worksheet file
+    for row in df.itertuples(index=False, name=None):
+        cells = []
+        for col_idx, (fixed_cell, is_text, value) in enumerate(zip(fixed_cells, text_flags, row)):
+            if fixed_cell is not None:
+                cell = fixed_cell
+                cell.value = value
+            elif is_text:
+                cell = text_cells[col_idx]
+                cell.value = str(value) if not pd.isna(value) and str(value).strip() != '' else ''
+            elif isinstance(value, (int, float)):
+                cell = number_cells[col_idx]
+                cell.value = value
+            elif summary:
+                cell = text_cells[col_idx]
+                cell.value = str(value)
+            elif isinstance(value, (datetime, pd.Timestamp)):
+                cell = date_cells[col_idx]
+                cell.value = value
+            else:
+                cell = text_cells[col_idx]
+                cell.value = str(value) if not pd.isna(value) else ''
+            
+            cells.append(cell)
+        ws.append(cells)
+    
+    return ws
+
 @app.post("/api/export-to-excel")
 async def export_to_excel(request: Request):
     """Export selected division data to Excel with summary and detailed sheets"""
@@ -1887,135 +2130,194 @@ async def export_to_excel(request: Request):
         
         # Get request body
         body = await request.json()
+        if not isinstance(body, dict):
+            raise HTTPException(status_code=400, detail="Invalid export request")
         selected_division = body.get('division', 'All')
         export_type = body.get('type', 'credit')
         
         print(f" Export Type: {export_type}, Division: {selected_division}")
         
         # Validate export type
-        if export_type not in ['credit', 'debit', 'arbitration', 'currentmonth', 'compensation', 'pr_approval']:
+        if not isinstance(export_type, str) or export_type not in EXPORT_REGISTRY:
             raise HTTPException(status_code=400, detail="Invalid export type")
         
-        # Handle Current Month Warranty export separately
-        if export_type == 'currentmonth':
-            return await export_current_month_warranty(selected_division)
-        
-        # Handle Compensation Claim export separately
-        if export_type == 'compensation':
-            return await export_compensation_claim(selected_division)
-        
-        # Handle PR Approval export separately
-        if export_type == 'pr_approval':
-            return await export_pr_approval(selected_division)
-        
-        # Get the appropriate dataframe
-        if export_type == 'credit':
-            df = WARRANTY_DATA['credit_df']
-        elif export_type == 'debit':
-            df = WARRANTY_DATA['debit_df']
-        else:  # arbitration
-            df = WARRANTY_DATA['arbitration_df']
+        # The Grand Total row covers every division, so it exports the same workbook as 'All'
+        export_division = 'All' if selected_division == 'Grand Total' else selected_division
         
-        if df is None or df.empty:
-            raise HTTPException(status_code=500, detail="No data available for export")
+        # Validate division against the loaded data, so only real divisions become export cache keys
+        data = data_snapshot()
+        if export_division != 'All' and export_division not in division_options(data[EXPORT_REGISTRY[export_type]['summary_key']]):
+            raise HTTPException(status_code=400, detail="Invalid division")
         
-        print(f" Original data rows: {len(df)}")
+        # Building a workbook takes seconds of CPU; run it in the worker pool so other requests are not blocked
+        content = await run_in_threadpool(build_export_bytes, export_type, export_division, data['generation'])
         
-        # Reverse dealer mapping
-        dealer_mapping = {
-            'AMRAVATI': 'AMT',
-            'CHAUFULA_SZZ': 'CHA',
-            'CHIKHALI': 'CHI',
-            'KOLHAPUR_WS': 'KOL',
-            'NAGPUR_KAMPTHEE ROAD': 'HO',
-            'NAGPUR_WARDHAMAN NGR': 'CITY',
-            'SHIKRAPUR_SZS': 'SHI',
-            'WAGHOLI': 'WAG',
-            'YAVATMAL': 'YAT',
-            'NAGPUR_WARDHAMAN NGR_CQ': 'CQ'
-        }
-        reverse_mapping = {v: k for k, v in dealer_mapping.items()}
+        filename = f"{selected_division}_{EXPORT_REGISTRY[export_type]['file_label']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
         
-        # Filter by division if not "All"
-        if selected_division != 'All' and selected_division != 'Grand Total':
-            df_export = df[df['Division'] == selected_division].copy()
-            # Add Grand Total row if exists
-            grand_total_row = df[df['Division'] == 'Grand Total']
-            if not grand_total_row.empty:
-                df_export = pd.concat([df_export, grand_total_row], ignore_index=True)
-        else:
-            df_export = df.copy()
+        print(f" Export file prepared: {filename}")
         
-        print(f" Filtered data rows: {len(df_export)}")
+        return Response(
+            content=content,
+            media_type=XLSX_MEDIA_TYPE,
+            headers={
+                "Content-Disposition": f"attachment; filename={filename}",
+                # xlsx files are already zip-compressed; this keeps GZipMiddleware from compressing them again
+                "Content-Encoding": "identity"
+            }
+        )
         
-        # Create workbook with styling
-        wb = Workbook()
+    except HTTPException as e:
+        raise
+    except Exception as e:
+        print(f" Export error: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Export error: {str(e)}")
+
+# Each entry holds a complete xlsx file in the single server process, so only the most recent few are kept
+@lru_cache(maxsize=8)
+def build_export_bytes(export_type, selected_division, generation):
+    """Build an export workbook once per (type, division, data generation) and return its bytes"""
+    # A build still running when a reload lands is cached under the old generation, which is never requested again
+    data = data_snapshot()
+    if 'detail_sheets' in EXPORT_REGISTRY[export_type]:
+        wb = build_summary_workbook(export_type, selected_division, data)
+    else:
+        wb = build_warranty_workbook(export_type, selected_division, data)
+    
+    output = io.BytesIO()
+    wb.save(output)
+    
+    return output.getvalue()
+
+def filter_summary_rows(df, selected_division):
+    """Return the summary rows for a division, keeping the Grand Total row"""
+    if selected_division == 'All':
+        return df
+    
+    # The Grand Total row is always appended last, so a single mask keeps the original row order
+    return df.loc[df['Division'].isin([selected_division, 'Grand Total'])]
+
+def build_warranty_workbook(export_type, selected_division, data):
+    """Build the Credit, Debit or Arbitration export workbook from a data snapshot"""
+    # Get the appropriate dataframe
+    df = data[EXPORT_REGISTRY[export_type]['summary_key']]
+    
+    if df is None or df.empty:
+        raise HTTPException(status_code=500, detail="No data available for export")
+    
+    print(f" Original data rows: {len(df)}")
+    
+    # Reverse dealer mapping
+    dealer_mapping = {
+        'AMRAVATI': 'AMT',
+        'CHAUFULA_SZZ': 'CHA',
+        'CHIKHALI': 'CHI',
+        'KOLHAPUR_WS': 'KOL',
+        'NAGPUR_KAMPTHEE ROAD': 'HO',
+        'NAGPUR_WARDHAMAN NGR': 'CITY',
+        'SHIKRAPUR_SZS': 'SHI',
+        'WAGHOLI': 'WAG',
+        'YAVATMAL': 'YAT',
+        'NAGPUR_WARDHAMAN NGR_CQ': 'CQ'
+    }
+    reverse_mapping = {v: k for k, v in dealer_mapping.items()}
+    
+    df_export = filter_summary_rows(df, selected_division)
+    
+    print(f" Filtered data rows: {len(df_export)}")
+    
+    # Create write-only workbook; rows are flushed to disk as they are appended
+    wb = new_export_workbook()
+    
+    # ==================== SHEET 1: SUMMARY ====================
+    if selected_division != 'All':
+        summary_title = f"{selected_division} - {export_type.capitalize()}"
+    else:
+        summary_title = export_type.capitalize()
+    
+    write_sheet(wb, summary_title, df_export, summary=True)
+    
+    # ==================== SHEET 2: DETAILED SOURCE DATA ====================
+    if selected_division != 'All':
+        detail_title = f"{selected_division} - Detailed Data"
         
-        # Define styles
-        header_fill = PatternFill(start_color="FF8C00", end_color="FF8C00", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=12)
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
+        # Get the dealer location for the selected division
+        dealer_location = reverse_mapping.get(selected_division)
         
-        # ==================== SHEET 1: SUMMARY ====================
-        ws1 = wb.active
-        if selected_division != 'All' and selected_division != 'Grand Total':
-            ws1.title = f"{selected_division} - {export_type.capitalize()}"
-        else:
-            ws1.title = export_type.capitalize()
-        
-        # Write headers for sheet 1
-        for col_idx, column in enumerate(df_export.columns, 1):
-            cell = ws1.cell(row=1, column=col_idx, value=column)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.border = border
-            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        
-        # Write data for sheet 1
-        for row_idx, row in enumerate(df_export.itertuples(index=False), 2):
-            for col_idx, value in enumerate(row, 1):
-                cell = ws1.cell(row=row_idx, column=col_idx)
-                
-                # Format the value
-                if isinstance(value, (int, float)):
-                    cell.value = value
-                    cell.number_format = '#,##0.00'
-                    cell.alignment = Alignment(horizontal='right', vertical='center')
-                else:
-                    cell.value = str(value)
-                    cell.alignment = Alignment(horizontal='left', vertical='center')
-                
-                cell.border = border
-        
-        # Adjust column widths for sheet 1
-        for col_idx, column in enumerate(df_export.columns, 1):
-            max_length = min(max(
-                df_export[column].astype(str).map(len).max(),
-                len(str(column))
-            ) + 2, 30)
-            ws1.column_dimensions[get_column_letter(col_idx)].width = max_length
-        
-        # ==================== SHEET 2: DETAILED SOURCE DATA ====================
-        if selected_division != 'All' and selected_division != 'Grand Total':
-            ws2 = wb.create_sheet()
-            ws2.title = f"{selected_division} - Detailed Data"
+        if dealer_location and data['source_df'] is not None:
+            source_df = data['source_df']
             
-            # Get the dealer location for the selected division
-            dealer_location = reverse_mapping.get(selected_division)
+            # Select the dealer's rows from the groups built with this source frame instead of scanning it
+            positions = data['source_rows_by_location'].get(dealer_location, [])
+            location_df = source_df.iloc[positions]
             
-            if dealer_location and WARRANTY_DATA['source_df'] is not None:
-                source_df = WARRANTY_DATA['source_df'].copy()
-                
-                # Filter by dealer location
-                detail_df = source_df[source_df['Dealer Location'] == dealer_location].copy()
+            # Classify arbitration IDs once: blank, "-" or "nan" means none, a valid one starts with ARB
+            arb_ids = location_df['Claim arbitration ID']
+            arb_text = arb_ids.astype(str).str.strip().str.upper()
+            no_arb_id = arb_ids.isna() | arb_text.isin(['', '-', 'NAN'])
+            has_arb_id = arb_ids.notna() & arb_text.str.startswith('ARB')
+            
+            # Define all required columns
+            required_columns = [
+                'Fiscal Month',
+                'Dealer Location',
+                'Claim arbitration ID',
+                'Claim Invoice Date',
+                'Claim No',
+                'Claim Date',
+                'Chassis No',
+                'Ro Id',
+                'Claim Type'
+            ]
+            
+            # Add amount columns based on export type
+            if export_type == 'arbitration':
+                required_columns.append('Credit Note Amount')
+            else:
+                required_columns.append('Total Claim Amount')
+            
+            # Further filter by export type and add type-specific columns
+            if export_type == 'credit':
+                detail_rows = (location_df['Credit Note Amount'] > 0) & no_arb_id
+                required_columns.append('Credit Note Amount')
+            
+            elif export_type == 'debit':
+                detail_rows = location_df['Debit Note Amount'] > 0
+                required_columns.append('Debit Note Amount')
+            
+            else:  # arbitration
+                detail_rows = has_arb_id
+                required_columns.append('Debit Note Amount')
+            
+            # Select rows and the required columns that exist in one step, producing a single new frame
+            available_columns = [col for col in required_columns if col in location_df.columns]
+            detail_df = location_df.loc[detail_rows, available_columns]
+            
+            # Format Claim No as text
+            if 'Claim No' in detail_df.columns:
+                detail_df['Claim No'] = format_claim_numbers(detail_df['Claim No'])
+            
+            # Add "RO" prefix to Ro Id
+            if 'Ro Id' in detail_df.columns:
+                detail_df['Ro Id'] = format_ro_ids(detail_df['Ro Id'])
+            
+            # Rename the amount column for arbitration
+            if export_type == 'arbitration' and 'Debit Note Amount' in detail_df.columns:
+                detail_df = detail_df.rename(columns={'Debit Note Amount': 'Arbitration Amount'})
+            
+            # source_df is stored in fiscal-month order, so the filtered rows are already sorted
+            print(f" Detailed data rows for {selected_division}: {len(detail_df)}")
+            
+            write_sheet(wb, detail_title, detail_df, text_columns=('Claim No', 'Ro Id'))
+            
+            # ==================== SHEET 3: PENDING ARBITRATION (Only for Arbitration Export) ====================
+            if export_type == 'arbitration':
+                # Get pending arbitration records
+                pending_rows = (location_df['Debit Note Amount'] > 0) & no_arb_id
                 
-                # Define all required columns
-                required_columns = [
+                # Define columns for pending arbitration
+                pending_columns = [
                     'Fiscal Month',
                     'Dealer Location',
                     'Claim arbitration ID',
@@ -2024,752 +2326,84 @@ async def export_to_excel(request: Request):
                     'Claim Date',
                     'Chassis No',
                     'Ro Id',
-                    'Claim Type'
+                    'Claim Type',
+                    'Credit Note Amount',
+                    'Debit Note Amount'
                 ]
                 
-                # Add amount columns based on export type
-                if export_type == 'arbitration':
-                    required_columns.append('Credit Note Amount')
-                else:
-                    required_columns.append('Total Claim Amount')
-                
-                # Helper function to check if Claim arbitration ID is empty or contains "-"
-                def is_empty_or_hyphen(value):
-                    if pd.isna(value): 
-                        return True
-                    value = str(value).strip()
-                    if value == '' or value == '-' or value.upper() == 'NAN':
-                        return True
-                    return False
-                
-                # Helper function to check if arbitration ID has valid ARB number
-                def has_valid_arb_id(value):
-                    if pd.isna(value): 
-                        return False
-                    value = str(value).strip().upper()
-                    return value.startswith('ARB') and value != 'NAN' and value != ''
-                
-                # Further filter by export type and add type-specific columns
-                if export_type == 'credit':
-                    detail_df = detail_df[detail_df['Credit Note Amount'] > 0].copy()
-                    detail_df = detail_df[detail_df['Claim arbitration ID'].apply(is_empty_or_hyphen)].copy()
-                    required_columns.append('Credit Note Amount')
-                    
-                elif export_type == 'debit':
-                    detail_df = detail_df[detail_df['Debit Note Amount'] > 0].copy()
-                    required_columns.append('Debit Note Amount')
-                    
-                else:  # arbitration
-                    detail_df = detail_df[detail_df['Claim arbitration ID'].apply(has_valid_arb_id)].copy()
-                    required_columns.append('Debit Note Amount')
-                
-                # Select only the required columns that exist
-                available_columns = [col for col in required_columns if col in detail_df.columns]
-                detail_df = detail_df[available_columns].copy()
+                # Select rows and available columns in one step
+                available_pending_columns = [col for col in pending_columns if col in location_df.columns]
+                pending_df = location_df.loc[pending_rows, available_pending_columns]
                 
                 # Format Claim No as text
-                if 'Claim No' in detail_df.columns:
-                    def format_claim_no(x):
-                        if pd.isna(x) or str(x).strip() == '':
-                            return ''
-                        try:
-                            return str(int(float(x)))
-                        except (ValueError, TypeError):
-                            return str(x).strip()
-                    
-                    detail_df['Claim No'] = detail_df['Claim No'].apply(format_claim_no)
+                if 'Claim No' in pending_df.columns:
+                    pending_df['Claim No'] = format_claim_numbers(pending_df['Claim No'])
                 
                 # Add "RO" prefix to Ro Id
-                if 'Ro Id' in detail_df.columns:
-                    def format_ro_id(x):
-                        if pd.isna(x) or str(x).strip() == '':
-                            return ''
-                        try:
-                            return f"RO{str(int(float(x)))}"
-                        except (ValueError, TypeError):
-                            value_str = str(x).strip()
-                            if not value_str.startswith('RO'):
-                                return f"RO{value_str}"
-                            return value_str
-                    
-                    detail_df['Ro Id'] = detail_df['Ro Id'].apply(format_ro_id)
+                if 'Ro Id' in pending_df.columns:
+                    pending_df['Ro Id'] = format_ro_ids(pending_df['Ro Id'])
                 
-                # Rename the amount column for arbitration
-                if export_type == 'arbitration' and 'Debit Note Amount' in detail_df.columns:
-                    detail_df = detail_df.rename(columns={'Debit Note Amount': 'Arbitration Amount'})
+                # Rename for clarity
+                if 'Debit Note Amount' in pending_df.columns:
+                    pending_df = pending_df.rename(columns={'Debit Note Amount': 'Pending Arbitration Amount'})
                 
-                # Sort by Fiscal Month
-                month_order = ['Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec', 'Jan', 'Feb', 'Mar']
-                detail_df['Month'] = detail_df['Fiscal Month'].astype(str).str.strip().str[:3]
-                detail_df['Month_Order'] = detail_df['Month'].apply(lambda x: month_order.index(x) if x in month_order else 999)
-                detail_df = detail_df.sort_values('Month_Order').drop(['Month', 'Month_Order'], axis=1)
+                print(f" Pending Arbitration rows for {selected_division}: {len(pending_df)}")
                 
-                print(f" Detailed data rows for {selected_division}: {len(detail_df)}")
-                
-                # Write headers for sheet 2
-                for col_idx, column in enumerate(detail_df.columns, 1):
-                    cell = ws2.cell(row=1, column=col_idx, value=column)
-                    cell.fill = header_fill
-                    cell.font = header_font
-                    cell.border = border
-                    cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                
-                # Write data for sheet 2
-                for row_idx, row in enumerate(detail_df.itertuples(index=False), 2):
-                    for col_idx, value in enumerate(row, 1):
-                        cell = ws2.cell(row=row_idx, column=col_idx)
-                        column_name = detail_df.columns[col_idx - 1]
-                        
-                        if column_name == 'Claim No':
-                            cell.value = str(value) if not pd.isna(value) and str(value).strip() != '' else ''
-                            cell.alignment = Alignment(horizontal='left', vertical='center')
-                        elif column_name == 'Ro Id':
-                            cell.value = str(value) if not pd.isna(value) and str(value).strip() != '' else ''
-                            cell.alignment = Alignment(horizontal='left', vertical='center')
-                        elif isinstance(value, (int, float)):
-                            cell.value = value
-                            cell.number_format = '#,##0.00'
-                            cell.alignment = Alignment(horizontal='right', vertical='center')
-                        elif isinstance(value, (datetime, pd.Timestamp)):
-                            cell.value = value
-                            cell.number_format = 'mm-dd-yyyy'
-                            cell.alignment = Alignment(horizontal='center', vertical='center')
-                        else:
-                            cell.value = str(value) if not pd.isna(value) else ''
-                            cell.alignment = Alignment(horizontal='left', vertical='center')
-                        
-                        cell.border = border
-                
-                # Adjust column widths for sheet 2
-                for col_idx, column in enumerate(detail_df.columns, 1):
-                    max_length = min(max(
-                        detail_df[column].astype(str).map(len).max(),
-                        len(str(column))
-                    ) + 2, 30)
-                    column_letter = ws2.cell(row=1, column=col_idx).column_letter
-                    ws2.column_dimensions[column_letter].width = max_length
-                
-                # ==================== SHEET 3: PENDING ARBITRATION (Only for Arbitration Export) ====================
-                if export_type == 'arbitration':
-                    ws3 = wb.create_sheet()
-                    ws3.title = f"{selected_division} - Pending Arb"
-                    
-                    # Get pending arbitration records
-                    pending_df = source_df[source_df['Dealer Location'] == dealer_location].copy()
-                    pending_df = pending_df[pending_df['Debit Note Amount'] > 0].copy()
-                    pending_df = pending_df[pending_df['Claim arbitration ID'].apply(is_empty_or_hyphen)].copy()
-                    
-                    # Define columns for pending arbitration
-                    pending_columns = [
-                        'Fiscal Month',
-                        'Dealer Location',
-                        'Claim arbitration ID',
-                        'Claim Invoice Date',
-                        'Claim No',
-                        'Claim Date',
-                        'Chassis No',
-                        'Ro Id',
-                        'Claim Type',
-                        'Credit Note Amount',
-                        'Debit Note Amount'
-                    ]
-                    
-                    # Select available columns
-                    available_pending_columns = [col for col in pending_columns if col in pending_df.columns]
-                    pending_df = pending_df[available_pending_columns].copy()
-                    
-                    # Format Claim No as text
-                    if 'Claim No' in pending_df.columns:
-                        def format_claim_no(x):
-                            if pd.isna(x) or str(x).strip() == '':
-                                return ''
-                            try:
-                                return str(int(float(x)))
-                            except (ValueError, TypeError):
-                                return str(x).strip()
-                        
-                        pending_df['Claim No'] = pending_df['Claim No'].apply(format_claim_no)
-                    
-                    # Add "RO" prefix to Ro Id
-                    if 'Ro Id' in pending_df.columns:
-                        def format_ro_id(x):
-                            if pd.isna(x) or str(x).strip() == '':
-                                return ''
-                            try:
-                                return f"RO{str(int(float(x)))}"
-                            except (ValueError, TypeError):
-                                value_str = str(x).strip()
-                                if not value_str.startswith('RO'):
-                                    return f"RO{value_str}"
-                                return value_str
-                        
-                        pending_df['Ro Id'] = pending_df['Ro Id'].apply(format_ro_id)
-                    
-                    # Rename for clarity
-                    if 'Debit Note Amount' in pending_df.columns:
-                        pending_df = pending_df.rename(columns={'Debit Note Amount': 'Pending Arbitration Amount'})
-                    
-                    # Sort by Fiscal Month
-                    pending_df['Month'] = pending_df['Fiscal Month'].astype(str).str.strip().str[:3]
-                    pending_df['Month_Order'] = pending_df['Month'].apply(lambda x: month_order.index(x) if x in month_order else 999)
-                    pending_df = pending_df.sort_values('Month_Order').drop(['Month', 'Month_Order'], axis=1)
-                    
-                    print(f" Pending Arbitration rows for {selected_division}: {len(pending_df)}")
-                    
-                    # Write headers for sheet 3
-                    for col_idx, column in enumerate(pending_df.columns, 1):
-                        cell = ws3.cell(row=1, column=col_idx, value=column)
-                        cell.fill = header_fill
-                        cell.font = header_font
-                        cell.border = border
-                        cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                    
-                    # Write data for sheet 3
-                    for row_idx, row in enumerate(pending_df.itertuples(index=False), 2):
-                        for col_idx, value in enumerate(row, 1):
-                            cell = ws3.cell(row=row_idx, column=col_idx)
-                            column_name = pending_df.columns[col_idx - 1]
-                            
-                            if column_name == 'Claim No':
-                                cell.value = str(value) if not pd.isna(value) and str(value).strip() != '' else ''
-                                cell.alignment = Alignment(horizontal='left', vertical='center')
-                            elif column_name == 'Ro Id':
-                                cell.value = str(value) if not pd.isna(value) and str(value).strip() != '' else ''
-                                cell.alignment = Alignment(horizontal='left', vertical='center')
-                            elif isinstance(value, (int, float)):
-                                cell.value = value
-                                cell.number_format = '#,##0.00'
-                                cell.alignment = Alignment(horizontal='right', vertical='center')
-                            elif isinstance(value, (datetime, pd.Timestamp)):
-                                cell.value = value
-                                cell.number_format = 'mm-dd-yyyy'
-                                cell.alignment = Alignment(horizontal='center', vertical='center')
-                            else:
-                                cell.value = str(value) if not pd.isna(value) else ''
-                                cell.alignment = Alignment(horizontal='left', vertical='center')
-                            
-                            cell.border = border
-                    
-                    # Adjust column widths for sheet 3
-                    for col_idx, column in enumerate(pending_df.columns, 1):
-                        max_length = min(max(
-                            pending_df[column].astype(str).map(len).max(),
-                            len(str(column))
-                        ) + 2, 30)
-                        column_letter = ws3.cell(row=1, column=col_idx).column_letter
-                        ws3.column_dimensions[column_letter].width = max_length
-        
-        # Save to BytesIO
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        
-        filename = f"{selected_division}_{export_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        
-        print(f" Export file prepared: {filename}")
-        
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
-        
-    except HTTPException as e:
-        raise
-    except Exception as e:
-        print(f" Export error: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Export error: {str(e)}")
-
-async def export_current_month_warranty(selected_division: str):
-    """Export Current Month Warranty data"""
-    try:
-        summary_df = WARRANTY_DATA['current_month_df']
-        source_df = WARRANTY_DATA['current_month_source_df']
-        
-        if summary_df is None or summary_df.empty:
-            raise HTTPException(status_code=500, detail="No current month warranty data available")
-        
-        # Filter by division if not "All"
-        if selected_division != 'All' and selected_division != 'Grand Total':
-            df_export = summary_df[summary_df['Division'] == selected_division].copy()
-            grand_total_row = summary_df[summary_df['Division'] == 'Grand Total']
-            if not grand_total_row.empty:
-                df_export = pd.concat([df_export, grand_total_row], ignore_index=True)
+                write_sheet(wb, f"{selected_division} - Pending Arb", pending_df, text_columns=('Claim No', 'Ro Id'))
         else:
-            df_export = summary_df.copy()
-        
-        # Create workbook
-        wb = Workbook()
-        
-        # Define styles
-        header_fill = PatternFill(start_color="FF8C00", end_color="FF8C00", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=12)
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # ==================== SHEET 1: SUMMARY ====================
-        ws1 = wb.active
-        if selected_division != 'All' and selected_division != 'Grand Total':
-            ws1.title = f"{selected_division} - Summary"
-        else:
-            ws1.title = "Current Month Summary"
-        
-        # Write headers
-        for col_idx, column in enumerate(df_export.columns, 1):
-            cell = ws1.cell(row=1, column=col_idx, value=column)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.border = border
-            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        
-        # Write data
-        for row_idx, row in enumerate(df_export.itertuples(index=False), 2):
-            for col_idx, value in enumerate(row, 1):
-                cell = ws1.cell(row=row_idx, column=col_idx)
-                
-                if isinstance(value, (int, float)):
-                    cell.value = value
-                    cell.number_format = '#,##0'
-                    cell.alignment = Alignment(horizontal='right', vertical='center')
-                else:
-                    cell.value = str(value)
-                    cell.alignment = Alignment(horizontal='left', vertical='center')
-                
-                cell.border = border
-        
-        # Adjust column widths
-        for col_idx, column in enumerate(df_export.columns, 1):
-            max_length = min(max(
-                df_export[column].astype(str).map(len).max(),
-                len(str(column))
-            ) + 2, 30)
-            ws1.column_dimensions[get_column_letter(col_idx)].width = max_length
-        
-        # ==================== SHEET 2: PENDING SPARES CLAIMS ====================
-        if source_df is not None and not source_df.empty:
-            # Filter source data by division if specific division selected
-            if selected_division != 'All' and selected_division != 'Grand Total':
-                spares_df = source_df[source_df['Division'] == selected_division].copy()
-            else:
-                spares_df = source_df.copy()
-            
-            # Filter only records where Pending Claims Spares is NOT empty
-            spares_df = spares_df[spares_df['Pending Claims Spares'].notna()].copy()
-            
-            if not spares_df.empty:
-                ws2 = wb.create_sheet()
-                if selected_division != 'All' and selected_division != 'Grand Total':
-                    ws2.title = f"{selected_division} - Spares"
-                else:
-                    ws2.title = "Pending Spares Claims"
-                
-                # Write headers
-                for col_idx, column in enumerate(spares_df.columns, 1):
-                    cell = ws2.cell(row=1, column=col_idx, value=column)
-                    cell.fill = header_fill
-                    cell.font = header_font
-                    cell.border = border
-                    cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                
-                # Write data
-                for row_idx, row in enumerate(spares_df.itertuples(index=False), 2):
-                    for col_idx, value in enumerate(row, 1):
-                        cell = ws2.cell(row=row_idx, column=col_idx)
-                        
-                        if isinstance(value, (int, float)):
-                            cell.value = value
-                            cell.number_format = '#,##0.00'
-                            cell.alignment = Alignment(horizontal='right', vertical='center')
-                        elif isinstance(value, (datetime, pd.Timestamp)):
-                            cell.value = value
-                            cell.number_format = 'mm-dd-yyyy'
-                            cell.alignment = Alignment(horizontal='center', vertical='center')
-                        else:
-                            cell.value = str(value) if not pd.isna(value) else ''
-                            cell.alignment = Alignment(horizontal='left', vertical='center')
-                        
-                        cell.border = border
-                
-                # Adjust column widths
-                for col_idx, column in enumerate(spares_df.columns, 1):
-                    max_length = min(max(
-                        spares_df[column].astype(str).map(len).max(),
-                        len(str(column))
-                    ) + 2, 35)
-                    column_letter = ws2.cell(row=1, column=col_idx).column_letter
-                    ws2.column_dimensions[column_letter].width = max_length
-                
-                print(f" Pending Spares Claims rows: {len(spares_df)}")
-        
-        # ==================== SHEET 3: PENDING LABOUR CLAIMS ====================
-        if source_df is not None and not source_df.empty:
-            # Filter source data by division if specific division selected
-            if selected_division != 'All' and selected_division != 'Grand Total':
-                labour_df = source_df[source_df['Division'] == selected_division].copy()
-            else:
-                labour_df = source_df.copy()
-            
-            # Filter only records where Pending Claims Labour is NOT empty
-            labour_df = labour_df[labour_df['Pending Claims Labour'].notna()].copy()
-            
-            if not labour_df.empty:
-                ws3 = wb.create_sheet()
-                if selected_division != 'All' and selected_division != 'Grand Total':
-                    ws3.title = f"{selected_division} - Labour"
-                else:
-                    ws3.title = "Pending Labour Claims"
-                
-                # Write headers
-                for col_idx, column in enumerate(labour_df.columns, 1):
-                    cell = ws3.cell(row=1, column=col_idx, value=column)
-                    cell.fill = header_fill
-                    cell.font = header_font
-                    cell.border = border
-                    cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                
-                # Write data
-                for row_idx, row in enumerate(labour_df.itertuples(index=False), 2):
-                    for col_idx, value in enumerate(row, 1):
-                        cell = ws3.cell(row=row_idx, column=col_idx)
-                        
-                        if isinstance(value, (int, float)):
-                            cell.value = value
-                            cell.number_format = '#,##0.00'
-                            cell.alignment = Alignment(horizontal='right', vertical='center')
-                        elif isinstance(value, (datetime, pd.Timestamp)):
-                            cell.value = value
-                            cell.number_format = 'mm-dd-yyyy'
-                            cell.alignment = Alignment(horizontal='center', vertical='center')
-                        else:
-                            cell.value = str(value) if not pd.isna(value) else ''
-                            cell.alignment = Alignment(horizontal='left', vertical='center')
-                        
-                        cell.border = border
-                
-                # Adjust column widths
-                for col_idx, column in enumerate(labour_df.columns, 1):
-                    max_length = min(max(
-                        labour_df[column].astype(str).map(len).max(),
-                        len(str(column))
-                    ) + 2, 35)
-                    column_letter = ws3.cell(row=1, column=col_idx).column_letter
-                    ws3.column_dimensions[column_letter].width = max_length
-                
-                print(f" Pending Labour Claims rows: {len(labour_df)}")
-        
-        # Save to BytesIO
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        
-        filename = f"{selected_division}_CurrentMonthWarranty_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        
-        print(f" Current Month Warranty export completed: {filename}")
-        
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
-        
-    except Exception as e:
-        print(f" Current Month Warranty export error: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Export error: {str(e)}")
+            wb.create_sheet(title=detail_title)
+    
+    return wb
 
-async def export_compensation_claim(selected_division: str):
-    """Export Compensation Claim data"""
+def build_summary_workbook(export_type, selected_division, data):
+    """Build a summary sheet plus the registered detail sheets for an export type from a data snapshot"""
+    config = EXPORT_REGISTRY[export_type]
     try:
-        summary_df = WARRANTY_DATA['compensation_df']
-        source_df = WARRANTY_DATA['compensation_source_df']
+        summary_df = data[config['summary_key']]
+        source_df = data[config['source_key']]
         
         if summary_df is None or summary_df.empty:
-            raise HTTPException(status_code=500, detail="No compensation claim data available")
-        
-        # Filter by division if not "All"
-        if selected_division != 'All' and selected_division != 'Grand Total':
-            df_export = summary_df[summary_df['Division'] == selected_division].copy()
-            grand_total_row = summary_df[summary_df['Division'] == 'Grand Total']
-            if not grand_total_row.empty:
-                df_export = pd.concat([df_export, grand_total_row], ignore_index=True)
-        else:
-            df_export = summary_df.copy()
-        
-        # Create workbook
-        wb = Workbook()
-        
-        # Define styles
-        header_fill = PatternFill(start_color="FF8C00", end_color="FF8C00", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=12)
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
+            raise HTTPException(status_code=500, detail=config['missing_message'])
         
-        # ==================== SHEET 1: SUMMARY ====================
-        ws1 = wb.active
-        if selected_division != 'All' and selected_division != 'Grand Total':
-            ws1.title = f"{selected_division} - Summary"
-        else:
-            ws1.title = "Compensation Summary"
-        
-        # Write headers
-        for col_idx, column in enumerate(df_export.columns, 1):
-            cell = ws1.cell(row=1, column=col_idx, value=column)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.border = border
-            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        
-        # Write data
-        for row_idx, row in enumerate(df_export.itertuples(index=False), 2):
-            for col_idx, value in enumerate(row, 1):
-                cell = ws1.cell(row=row_idx, column=col_idx)
-                
-                if isinstance(value, (int, float)):
-                    cell.value = value
-                    cell.number_format = '#,##0.00'
-                    cell.alignment = Alignment(horizontal='right', vertical='center')
-                else:
-                    cell.value = str(value)
-                    cell.alignment = Alignment(horizontal='left', vertical='center')
-                
-                cell.border = border
-        
-        # Adjust column widths
-        for col_idx, column in enumerate(df_export.columns, 1):
-            max_length = min(max(
-                df_export[column].astype(str).map(len).max(),
-                len(str(column))
-            ) + 2, 30)
-            ws1.column_dimensions[get_column_letter(col_idx)].width = max_length
-        
-        # ==================== SHEET 2: DETAILED COMPENSATION CLAIMS ====================
-        if source_df is not None and not source_df.empty:
-            # Filter source data by division if specific division selected
-            if selected_division != 'All' and selected_division != 'Grand Total':
-                detail_df = source_df[source_df['Division'] == selected_division].copy()
-            else:
-                detail_df = source_df.copy()
-            
-            if not detail_df.empty:
-                ws2 = wb.create_sheet()
-                if selected_division != 'All' and selected_division != 'Grand Total':
-                    ws2.title = f"{selected_division} - Details"
-                else:
-                    ws2.title = "Compensation Details"
-                
-                # Write headers
-                for col_idx, column in enumerate(detail_df.columns, 1):
-                    cell = ws2.cell(row=1, column=col_idx, value=column)
-                    cell.fill = header_fill
-                    cell.font = header_font
-                    cell.border = border
-                    cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                
-                # Write data
-                for row_idx, row in enumerate(detail_df.itertuples(index=False), 2):
-                    for col_idx, value in enumerate(row, 1):
-                        cell = ws2.cell(row=row_idx, column=col_idx)
-                        column_name = detail_df.columns[col_idx - 1]
-                        
-                        if column_name == 'RO Id.':
-                            cell.value = str(value) if not pd.isna(value) and str(value).strip() != '' else ''
-                            cell.alignment = Alignment(horizontal='left', vertical='center')
-                        elif isinstance(value, (int, float)):
-                            cell.value = value
-                            cell.number_format = '#,##0.00'
-                            cell.alignment = Alignment(horizontal='right', vertical='center')
-                        elif isinstance(value, (datetime, pd.Timestamp)):
-                            cell.value = value
-                            cell.number_format = 'mm-dd-yyyy'
-                            cell.alignment = Alignment(horizontal='center', vertical='center')
-                        else:
-                            cell.value = str(value) if not pd.isna(value) else ''
-                            cell.alignment = Alignment(horizontal='left', vertical='center')
-                        
-                        cell.border = border
-                
-                # Adjust column widths
-                for col_idx, column in enumerate(detail_df.columns, 1):
-                    max_length = min(max(
-                        detail_df[column].astype(str).map(len).max(),
-                        len(str(column))
-                    ) + 2, 35)
-                    column_letter = ws2.cell(row=1, column=col_idx).column_letter
-                    ws2.column_dimensions[column_letter].width = max_length
-                
-                print(f" Compensation Claim details rows: {len(detail_df)}")
-        
-        # Save to BytesIO
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        
-        filename = f"{selected_division}_CompensationClaim_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        
-        print(f" Compensation Claim export completed: {filename}")
-        
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
-        
-    except Exception as e:
-        print(f" Compensation Claim export error: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Export error: {str(e)}")
-
-async def export_pr_approval(selected_division: str):
-    """Export PR Approval data"""
-    try:
-        summary_df = WARRANTY_DATA['pr_approval_df']
-        source_df = WARRANTY_DATA['pr_approval_source_df']
+        by_division = selected_division != 'All'
+        df_export = filter_summary_rows(summary_df, selected_division)
         
-        if summary_df is None or summary_df.empty:
-            raise HTTPException(status_code=500, detail="No PR Approval data available")
-        
-        # Filter by division if not "All"
-        if selected_division != 'All' and selected_division != 'Grand Total':
-            df_export = summary_df[summary_df['Division'] == selected_division].copy()
-            grand_total_row = summary_df[summary_df['Division'] == 'Grand Total']
-            if not grand_total_row.empty:
-                df_export = pd.concat([df_export, grand_total_row], ignore_index=True)
-        else:
-            df_export = summary_df.copy()
-        
-        # Create workbook
-        wb = Workbook()
-        
-        # Define styles
-        header_fill = PatternFill(start_color="FF8C00", end_color="FF8C00", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=12)
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
+        # Create write-only workbook
+        wb = new_export_workbook()
         
         # ==================== SHEET 1: SUMMARY ====================
-        ws1 = wb.active
-        if selected_division != 'All' and selected_division != 'Grand Total':
-            ws1.title = f"{selected_division} - Summary"
-        else:
-            ws1.title = "PR Approval Summary"
-        
-        # Write headers
-        for col_idx, column in enumerate(df_export.columns, 1):
-            cell = ws1.cell(row=1, column=col_idx, value=column)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.border = border
-            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        
-        # Write data
-        for row_idx, row in enumerate(df_export.itertuples(index=False), 2):
-            for col_idx, value in enumerate(row, 1):
-                cell = ws1.cell(row=row_idx, column=col_idx)
-                
-                if isinstance(value, (int, float)):
-                    cell.value = value
-                    cell.number_format = '#,##0.00'
-                    cell.alignment = Alignment(horizontal='right', vertical='center')
-                else:
-                    cell.value = str(value)
-                    cell.alignment = Alignment(horizontal='left', vertical='center')
-                
-                cell.border = border
+        summary_title = f"{selected_division} - Summary" if by_division else config['summary_title']
+        write_sheet(wb, summary_title, df_export, number_format=config['number_format'], summary=True)
         
-        # Adjust column widths
-        for col_idx, column in enumerate(df_export.columns, 1):
-            max_length = min(max(
-                df_export[column].astype(str).map(len).max(),
-                len(str(column))
-            ) + 2, 30)
-            ws1.column_dimensions[get_column_letter(col_idx)].width = max_length
-        
-        # ==================== SHEET 2: COMPLETE DETAILED DATA ====================
+        # ==================== DETAIL SHEETS ====================
         if source_df is not None and not source_df.empty:
             # Filter source data by division if specific division selected
-            if selected_division != 'All' and selected_division != 'Grand Total':
-                detail_df = source_df[source_df['Division'] == selected_division].copy()
+            if by_division:
+                division_df = source_df[source_df['Division'] == selected_division]
             else:
-                detail_df = source_df.copy()
+                division_df = source_df
             
-            if not detail_df.empty:
-                ws2 = wb.create_sheet()
-                if selected_division != 'All' and selected_division != 'Grand Total':
-                    ws2.title = f"{selected_division} - Details"
-                else:
-                    ws2.title = "PR Approval Details"
+            for sheet in config['detail_sheets']:
+                detail_df = division_df
                 
-                # Write headers
-                for col_idx, column in enumerate(detail_df.columns, 1):
-                    cell = ws2.cell(row=1, column=col_idx, value=column)
-                    cell.fill = header_fill
-                    cell.font = header_font
-                    cell.border = border
-                    cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+                # Keep only records where the sheet's required column is NOT empty
+                if 'required_column' in sheet:
+                    detail_df = detail_df[detail_df[sheet['required_column']].notna()]
                 
-                # Write data
-                for row_idx, row in enumerate(detail_df.itertuples(index=False), 2):
-                    for col_idx, value in enumerate(row, 1):
-                        cell = ws2.cell(row=row_idx, column=col_idx)
-                        
-                        if isinstance(value, (int, float)):
-                            cell.value = value
-                            cell.number_format = '#,##0.00'
-                            cell.alignment = Alignment(horizontal='right', vertical='center')
-                        elif isinstance(value, (datetime, pd.Timestamp)):
-                            cell.value = value
-                            cell.number_format = 'mm-dd-yyyy'
-                            cell.alignment = Alignment(horizontal='center', vertical='center')
-                        else:
-                            cell.value = str(value) if not pd.isna(value) else ''
-                            cell.alignment = Alignment(horizontal='left', vertical='center')
-                        
-                        cell.border = border
+                if detail_df.empty:
+                    continue
                 
-                # Adjust column widths
-                for col_idx, column in enumerate(detail_df.columns, 1):
-                    max_length = min(max(
-                        detail_df[column].astype(str).map(len).max(),
-                        len(str(column))
-                    ) + 2, 35)
-                    column_letter = ws2.cell(row=1, column=col_idx).column_letter
-                    ws2.column_dimensions[column_letter].width = max_length
+                detail_title = f"{selected_division} - {sheet['suffix']}" if by_division else sheet['title']
+                write_sheet(wb, detail_title, detail_df, max_width=35, text_columns=sheet.get('text_columns', ()))
                 
-                print(f" PR Approval details rows: {len(detail_df)}")
-        
-        # Save to BytesIO
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-        
-        filename = f"{selected_division}_PrApproval_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+                print(f" {sheet['title']} rows: {len(detail_df)}")
         
-        print(f" PR Approval export completed: {filename}")
+        print(f" {config['name']} export workbook built for {selected_division}")
         
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+        return wb
         
     except Exception as e:
-        print(f" PR Approval export error: {e}")
+        print(f" {config['name']} export error: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Export error: {str(e)}")
@@ -2786,8 +2420,7 @@ async def get_captcha():
 @app.get("/api/vehicle-images")
 async def get_vehicle_images():
     """Return vehicle images"""
-    images_data = [{'name': img['name'], 'data': img['data']} for img in MAHINDRA_IMAGES]
-    return {"images": images_data}
+    return Response(content=VEHICLE_IMAGES_JSON, media_type="application/json")
 
 @app.post("/api/login")
 async def api_login(request: Request):
@@ -2829,104 +2462,246 @@ async def api_login(request: Request):
         print(f"Login error: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+# Dashboard tables: WARRANTY_DATA key and maximum fraction digits shown for numbers
+DASHBOARD_TABLES = {
+    'credit': ('credit_df', 0),
+    'debit': ('debit_df', 0),
+    'arbitration': ('arbitration_df', 0),
+    'currentMonth': ('current_month_df', 0),
+    'compensation': ('compensation_df', 2),
+    'prApproval': ('pr_approval_df', 2)
+}
+
+def division_options(df):
+    """Return the sorted divisions of a summary frame, without the Grand Total row"""
+    if df is None or 'Division' not in df.columns:
+        return []
+    return sorted({str(division) for division in df['Division'].dropna() if division and division != 'Grand Total'})
+
+def dataframe_records(df):
+    """Convert a DataFrame to JSON-ready records with missing values replaced by 0"""
+    if df is None:
+        return []
+    # Replace missing values in one vectorized pass instead of checking every cell
+    return df.astype(object).where(df.notna(), 0).to_dict('records')
+
+@lru_cache(maxsize=1)
+def build_warranty_payload(generation):
+    """Serialize the dashboard tables once per data generation and return the JSON bytes, gzipped bytes and ETag"""
+    data = data_snapshot()
+    if data['credit_df'] is None:
+        print(f" Warranty data not loaded")
+    else:
+        print(f" Processing warranty data...")
+    
+    # One list of row records per table, the shape existing clients of this endpoint read
+    payload = {}
+    for table, (df_key, _) in DASHBOARD_TABLES.items():
+        payload[table] = dataframe_records(data[df_key])
+        df = data[df_key]
+        print(f"   {table} rows: {0 if df is None else len(df)}")
+    
+    content = orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    
+    return content, gzip.compress(content, 9), f'"{hashlib.sha1(content).hexdigest()}"'
+
+@lru_cache(maxsize=1)
+def build_divisions_payload(generation):
+    """Serialize the export division filter options once per data generation and return the JSON bytes, gzipped bytes and ETag"""
+    data = data_snapshot()
+    
+    # Sorted divisions for each export type, so the dashboard never downloads the tables to build its filter
+    divisions = {
+        export_type: division_options(data[config['summary_key']])
+        for export_type, config in EXPORT_REGISTRY.items()
+    }
+    content = orjson.dumps(divisions)
+    
+    return content, gzip.compress(content, 9), f'"{hashlib.sha1(content).hexdigest()}"'
+
+def format_indian_number(value, fraction_digits):
+    """Format a number the way the browser's toLocaleString('en-IN') does"""
+    # Round the shortest decimal form half away from zero and drop trailing zeros, as ICU does
+    quantum = Decimal(1).scaleb(-fraction_digits)
+    rounded = abs(Decimal(repr(value))).quantize(quantum, rounding=ROUND_HALF_UP)
+    whole, _, fraction = f"{rounded:f}".partition('.')
+    fraction = fraction.rstrip('0')
+    
+    # Indian digit grouping: the last three digits, then groups of two
+    if len(whole) > 3:
+        head, tail = whole[:-3], whole[-3:]
+        groups = []
+        while len(head) > 2:
+            groups.insert(0, head[-2:])
+            head = head[:-2]
+        groups.insert(0, head)
+        whole = ','.join(groups) + ',' + tail
+    
+    sign = '-' if math.copysign(1, value) < 0 else ''
+    return sign + whole + ('.' + fraction if fraction else '')
+
+def format_table_cell(value, fraction_digits):
+    """Return the escaped cell text the dashboard shows for a record value"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return format_indian_number(value, fraction_digits)
+    return html.escape(str(value))
+
+@lru_cache(maxsize=len(DASHBOARD_TABLES))
+def build_table_html(table, generation):
+    """Render a dashboard table once per data generation as thead/tbody HTML and return the bytes, gzipped bytes and ETag"""
+    df_key, fraction_digits = DASHBOARD_TABLES[table]
+    records = dataframe_records(data_snapshot()[df_key])
+    
+    if not records:
+        content = '<thead></thead><tbody></tbody>'.encode()
+    else:
+        headers = list(records[0].keys())
+        parts = ['<thead><tr>']
+        parts.extend(f'<th>{html.escape(str(h))}</th>' for h in headers)
+        parts.append('</tr></thead><tbody>')
+        for record in records:
+            parts.append('<tr>')
+            parts.extend(f'<td>{format_table_cell(record[h], fraction_digits)}</td>' for h in headers)
+            parts.append('</tr>')
+        parts.append('</tbody>')
+        content = ''.join(parts).encode()
+    
+    return content, gzip.compress(content, 9), f'"{hashlib.sha1(content).hexdigest()}"'
+
+def clear_response_caches():
+    """Drop cached JSON, HTML and Excel responses after WARRANTY_DATA changes"""
+    build_warranty_payload.cache_clear()
+    build_divisions_payload.cache_clear()
+    build_table_html.cache_clear()
+    build_export_bytes.cache_clear()
+
 @app.get("/api/warranty-data")
-async def get_warranty_data():
+async def get_warranty_data(request: Request):
     """Get warranty data (Credit, Debit, Arbitration, Current Month)"""
     try:
         print(f" Warranty data request received")
         
-        if WARRANTY_DATA['credit_df'] is None:
-            print(f" Warranty data not loaded")
-            return {
-                "credit": [],
-                "debit": [],
-                "arbitration": [],
-                "currentMonth": [],
-                "compensation": [],
-                "prApproval": []
-            }
-        
-        print(f" Processing warranty data...")
-        credit_records = WARRANTY_DATA['credit_df'].to_dict('records')
-        debit_records = WARRANTY_DATA['debit_df'].to_dict('records')
-        arbitration_records = WARRANTY_DATA['arbitration_df'].to_dict('records')
-        
-        # Process current month warranty data
-        current_month_records = []
-        if WARRANTY_DATA['current_month_df'] is not None:
-            current_month_records = WARRANTY_DATA['current_month_df'].to_dict('records')
-        
-        # Process compensation claim data
-        compensation_records = []
-        if WARRANTY_DATA['compensation_df'] is not None:
-            compensation_records = WARRANTY_DATA['compensation_df'].to_dict('records')
-        
-        # Process PR Approval data
-        pr_approval_records = []
-        if WARRANTY_DATA['pr_approval_df'] is not None:
-            pr_approval_records = WARRANTY_DATA['pr_approval_df'].to_dict('records')
-        
-        for records in [credit_records, debit_records, arbitration_records, current_month_records, compensation_records, pr_approval_records]:
-            for record in records:
-                for key in record:
-                    if pd.isna(record[key]):
-                        record[key] = 0
-        
-        print(f"   Warranty data prepared successfully")
-        print(f"   Credit rows: {len(credit_records)}")
-        print(f"   Debit rows: {len(debit_records)}")
-        print(f"   Arbitration rows: {len(arbitration_records)}")
-        print(f"   Current Month rows: {len(current_month_records)}")
-        print(f"   Compensation rows: {len(compensation_records)}")
-        print(f"   PR Approval rows: {len(pr_approval_records)}")
+        content, content_gz, etag = build_warranty_payload(WARRANTY_DATA['generation'])
         
-        return {
-            "credit": credit_records,
-            "debit": debit_records,
-            "arbitration": arbitration_records,
-            "currentMonth": current_month_records,
-            "compensation": compensation_records,
-            "prApproval": pr_approval_records
-        }
+        return cached_response(request, content, content_gz, "application/json", etag, RESPONSE_CACHE_CONTROL)
     except Exception as e:
         print(f" Unexpected error: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/divisions")
+async def get_divisions(request: Request):
+    """Get the division filter options for each export type"""
+    try:
+        content, content_gz, etag = build_divisions_payload(WARRANTY_DATA['generation'])
+        
+        return cached_response(request, content, content_gz, "application/json", etag, RESPONSE_CACHE_CONTROL)
+    except Exception as e:
+        print(f" Error loading divisions: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/reload")
+async def reload_data(session_id: str = Cookie(None)):
+    """Re-read the source workbooks and rebuild the cached responses"""
+    if not session_id or not verify_session(session_id):
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    try:
+        print(f" Data reload requested by user {verify_session(session_id)}")
+        await run_in_threadpool(load_warranty_data)
+        return {"success": True, "message": "Warranty data reloaded"}
+    except Exception as e:
+        print(f" Error reloading data: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/warranty-html/{table}")
+async def get_warranty_html(table: str, request: Request):
+    """Get a dashboard table as pre-rendered HTML"""
+    if table not in DASHBOARD_TABLES:
+        raise HTTPException(status_code=404, detail="Unknown table")
+    
+    try:
+        content, content_gz, etag = build_table_html(table, WARRANTY_DATA['generation'])
+        
+        return cached_response(request, content, content_gz, "text/html", etag, RESPONSE_CACHE_CONTROL)
+    except Exception as e:
+        print(f" Error rendering {table} table: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/login-page")
 async def login_page():
     """Serve the login page"""
     return HTMLResponse(content=LOGIN_PAGE)
 
 @app.get("/dashboard")
-async def dashboard():
+async def dashboard(request: Request):
     """Serve dashboard (no login required)"""
-    return HTMLResponse(content=DASHBOARD_HTML)
+    return cached_response(request, DASHBOARD_HTML_BYTES, DASHBOARD_HTML_GZ, "text/html", DASHBOARD_HTML_ETAG, HTML_CACHE_CONTROL)
 
 
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Root route - directly serve dashboard (no login required)"""
-    return HTMLResponse(content=DASHBOARD_HTML)
+    return cached_response(request, DASHBOARD_HTML_BYTES, DASHBOARD_HTML_GZ, "text/html", DASHBOARD_HTML_ETAG, HTML_CACHE_CONTROL)
 
-# ==================== STARTUP ====================
-
-print("\n" + "=" * 100)
-print("STARTING WARRANTY MANAGEMENT SYSTEM - PORT 8001")
-print("=" * 100)
-
-print("\nProcessing warranty data...")
-WARRANTY_DATA['credit_df'], WARRANTY_DATA['debit_df'], WARRANTY_DATA['arbitration_df'], WARRANTY_DATA['source_df'] = process_warranty_data()
+@app.get("/static/{asset}")
+async def get_static_asset(asset: str, request: Request):
+    """Serve a versioned dashboard stylesheet or script"""
+    if asset not in STATIC_ASSETS:
+        raise HTTPException(status_code=404, detail="Unknown asset")
+    
+    content, content_gz, etag, media_type = STATIC_ASSETS[asset]
+    return cached_response(request, content, content_gz, media_type, etag, ASSET_CACHE_CONTROL)
 
-print("\nProcessing current month warranty data...")
-WARRANTY_DATA['current_month_df'], WARRANTY_DATA['current_month_source_df'] = process_current_month_warranty()
+# ==================== STARTUP ====================
 
-print("\nProcessing compensation claim data...")
-WARRANTY_DATA['compensation_df'], WARRANTY_DATA['compensation_source_df'] = process_compensation_claim()
+sys.stdout.write("\n" + "=" * 100 + "\nSTARTING WARRANTY MANAGEMENT SYSTEM - PORT 8001\n" + "=" * 100 + "\n")
+sys.stdout.flush()
 
-print("\nProcessing PR Approval data...")
-WARRANTY_DATA['pr_approval_df'], WARRANTY_DATA['pr_approval_source_df'] = process_pr_approval()
+def load_warranty_data():
+    """Process all source workbooks, publish the results and drop every cached response"""
+    global LAST_MODIFIED
+    
+    with DATA_RELOAD_LOCK:
+        # Files may have been added or replaced since the directories were last listed
+        list_data_directory.cache_clear()
+        
+        # The four source workbooks are independent, so load them concurrently
+        print("\nProcessing warranty, current month, compensation claim and PR Approval data...")
+        loaded = {}
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            warranty_future = executor.submit(process_warranty_data)
+            current_month_future = executor.submit(process_current_month_warranty)
+            compensation_future = executor.submit(process_compensation_claim)
+            pr_approval_future = executor.submit(process_pr_approval)
+        
+            loaded['credit_df'], loaded['debit_df'], loaded['arbitration_df'], loaded['source_df'] = warranty_future.result()
+            loaded['current_month_df'], loaded['current_month_source_df'] = current_month_future.result()
+            loaded['compensation_df'], loaded['compensation_source_df'] = compensation_future.result()
+            loaded['pr_approval_df'], loaded['pr_approval_source_df'] = pr_approval_future.result()
+        
+        # Row positions per Dealer Location belong to this source frame, so they are published with it
+        source_df = loaded['source_df']
+        loaded['source_rows_by_location'] = {} if source_df is None else source_df.groupby('Dealer Location', sort=False, observed=True).indices
+        loaded['generation'] = WARRANTY_DATA['generation'] + 1
+        
+        # Publish every frame at once so requests never see a mix of old and new data
+        WARRANTY_DATA.update(loaded)
+        LAST_MODIFIED = formatdate(usegmt=True)
+        clear_response_caches()
+
+load_warranty_data()
 
 if __name__ == "__main__":
     hostname = socket.gethostname()
@@ -2937,15 +2712,25 @@ if __name__ == "__main__":
     
     port = 8001
     
-    print("\n" + "=" * 100)
-    print(f" SERVER READY - Warranty Dashboard")
-    print("=" * 100)
-    print(f" PORT: 8001")
-    print(f" Login URL: http://localhost:{port}/login-page")
-    print(f" Network URL: http://{local_ip}:{port}/login-page")
-    print(f"\n Test Credentials:")
-    print(f"   User ID: 11724")
-    print(f"   Password: un001@123")
-    print("\n" + "=" * 100 + "\n")
+    # Emit the whole banner with one write so it is never interleaved with worker logs
+    banner = "\n".join([
+        "",
+        "=" * 100,
+        " SERVER READY - Warranty Dashboard",
+        "=" * 100,
+        f" PORT: {port}",
+        f" Login URL: http://localhost:{port}/login-page",
+        f" Network URL: http://{local_ip}:{port}/login-page",
+        "",
+        " Test Credentials:",
+        "   User ID: 11724",
+        "   Password: un001@123",
+        "",
+        "=" * 100,
+        "",
+        "",
+    ])
+    sys.stdout.write(banner)
+    sys.stdout.flush()
     
     uvicorn.run(app, host="0.0.0.0", port=port)